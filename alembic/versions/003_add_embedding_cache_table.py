@@ -0,0 +1,46 @@
+"""Add embedding_cache table and file_hash lookup index
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Content-addressed cache of chunk embeddings shared by every pathway
+    op.create_table(
+        'embedding_cache',
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('model', sa.String(), nullable=False),
+        sa.Column('embedding', Vector(384), nullable=False),
+        sa.Column('created', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('content_hash')
+    )
+
+    # Lets a re-uploaded PDF be found by file hash in any collection.
+    # langchain_pg_embedding is created by langchain-postgres on first use.
+    op.execute("""
+        DO $$
+        BEGIN
+            IF to_regclass('langchain_pg_embedding') IS NOT NULL THEN
+                CREATE INDEX IF NOT EXISTS ix_langchain_pg_embedding_file_hash
+                ON langchain_pg_embedding ((cmetadata->>'file_hash'));
+            END IF;
+        END $$;
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_langchain_pg_embedding_file_hash")
+    op.drop_table('embedding_cache')
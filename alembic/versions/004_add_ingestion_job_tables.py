@@ -0,0 +1,60 @@
+"""Add ingestion_job and ingestion_job_file tables
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    job_status = sa.Enum('QUEUED', 'RUNNING', 'COMPLETED', 'FAILED', name='jobstatus')
+
+    op.create_table(
+        'ingestion_job',
+        sa.Column('id', sa.UUID(as_uuid=True), nullable=False),
+        sa.Column('pathway_id', sa.UUID(as_uuid=True), nullable=False),
+        sa.Column('status', job_status, nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('batches_done', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('chunks_stored', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('locked_by', sa.String(), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created', sa.DateTime(), nullable=True),
+        sa.Column('updated', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['pathway_id'], ['pathway.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ingestion_job_pathway_id'), 'ingestion_job', ['pathway_id'], unique=False)
+    op.create_index(op.f('ix_ingestion_job_status'), 'ingestion_job', ['status'], unique=False)
+
+    op.create_table(
+        'ingestion_job_file',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('job_id', sa.UUID(as_uuid=True), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('filename', sa.String(), nullable=False),
+        sa.Column('content', sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(['job_id'], ['ingestion_job.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ingestion_job_file_job_id'), 'ingestion_job_file', ['job_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_ingestion_job_file_job_id'), table_name='ingestion_job_file')
+    op.drop_table('ingestion_job_file')
+    op.drop_index(op.f('ix_ingestion_job_status'), table_name='ingestion_job')
+    op.drop_index(op.f('ix_ingestion_job_pathway_id'), table_name='ingestion_job')
+    op.drop_table('ingestion_job')
+    sa.Enum(name='jobstatus').drop(op.get_bind(), checkfirst=True)
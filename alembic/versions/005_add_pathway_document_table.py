@@ -0,0 +1,64 @@
+"""Add pathway_document table for per-document ingestion
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # embeddingstatus already exists (pathway.embedding_status)
+    embedding_status = postgresql.ENUM(
+        'PENDING', 'PROCESSING', 'COMPLETED', 'FAILED', name='embeddingstatus', create_type=False
+    )
+
+    op.create_table(
+        'pathway_document',
+        sa.Column('id', sa.UUID(as_uuid=True), nullable=False),
+        sa.Column('pathway_id', sa.UUID(as_uuid=True), nullable=False),
+        sa.Column('filename', sa.String(), nullable=False),
+        sa.Column('file_hash', sa.String(length=64), nullable=False),
+        sa.Column('chunk_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('embedding_status', embedding_status, nullable=False),
+        sa.Column('created', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['pathway_id'], ['pathway.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('pathway_id', 'file_hash', name='uq_pathway_document_hash')
+    )
+    op.create_index(op.f('ix_pathway_document_pathway_id'), 'pathway_document', ['pathway_id'], unique=False)
+
+    op.add_column('ingestion_job_file', sa.Column('document_id', sa.UUID(as_uuid=True), nullable=True))
+    op.create_foreign_key(
+        'fk_ingestion_job_file_document_id', 'ingestion_job_file', 'pathway_document',
+        ['document_id'], ['id'], ondelete='CASCADE'
+    )
+
+    # Per-document deletion filters chunks by this metadata key
+    op.execute("""
+        DO $$
+        BEGIN
+            IF to_regclass('langchain_pg_embedding') IS NOT NULL THEN
+                CREATE INDEX IF NOT EXISTS ix_langchain_pg_embedding_document_id
+                ON langchain_pg_embedding ((cmetadata->>'document_id'));
+            END IF;
+        END $$;
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_langchain_pg_embedding_document_id")
+    op.drop_constraint('fk_ingestion_job_file_document_id', 'ingestion_job_file', type_='foreignkey')
+    op.drop_column('ingestion_job_file', 'document_id')
+    op.drop_index(op.f('ix_pathway_document_pathway_id'), table_name='pathway_document')
+    op.drop_table('pathway_document')
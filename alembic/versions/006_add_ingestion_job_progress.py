@@ -0,0 +1,24 @@
+"""Add progress snapshot column to ingestion_job
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('ingestion_job', sa.Column('progress', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('ingestion_job', 'progress')
@@ -0,0 +1,73 @@
+"""Extend document_chunks as the vector store and copy existing LangChain rows
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('document_chunks', sa.Column('document_id', sa.UUID(as_uuid=True), nullable=True))
+    op.add_column('document_chunks', sa.Column('source', sa.Text(), nullable=True))
+    op.add_column('document_chunks', sa.Column('page', sa.Integer(), nullable=True))
+    op.add_column('document_chunks', sa.Column('chunk_index', sa.Integer(), nullable=True))
+    op.add_column('document_chunks', sa.Column('file_hash', sa.Text(), nullable=True))
+    op.add_column('document_chunks', sa.Column('embedding_model', sa.Text(), nullable=True))
+    op.add_column('document_chunks', sa.Column('cmetadata', postgresql.JSONB(), nullable=True))
+    op.create_foreign_key(
+        'fk_document_chunks_document_id', 'document_chunks', 'pathway_document',
+        ['document_id'], ['id'], ondelete='CASCADE'
+    )
+    op.create_index(op.f('ix_document_chunks_document_id'), 'document_chunks', ['document_id'], unique=False)
+
+    # Move chunks stored through LangChain's PGVector (one collection per
+    # pathway) into document_chunks, which is now read by all retrieval.
+    op.execute("""
+        DO $$
+        BEGIN
+            IF to_regclass('langchain_pg_embedding') IS NOT NULL THEN
+                INSERT INTO document_chunks (
+                    pathway_id, document_id, content, embedding, source, page,
+                    chunk_index, file_hash, embedding_model, cmetadata
+                )
+                SELECT p.id,
+                       d.id,
+                       e.document,
+                       e.embedding::vector(384),
+                       e.cmetadata->>'source',
+                       (e.cmetadata->>'page')::int,
+                       (e.cmetadata->>'chunk_index')::int,
+                       e.cmetadata->>'file_hash',
+                       e.cmetadata->>'embedding_model',
+                       e.cmetadata
+                FROM langchain_pg_embedding e
+                JOIN langchain_pg_collection c ON c.uuid = e.collection_id
+                JOIN pathway p ON c.name = 'pathway_' || p.id::text
+                LEFT JOIN pathway_document d
+                       ON d.id::text = e.cmetadata->>'document_id' AND d.pathway_id = p.id;
+            END IF;
+        END $$;
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_document_chunks_document_id'), table_name='document_chunks')
+    op.drop_constraint('fk_document_chunks_document_id', 'document_chunks', type_='foreignkey')
+    op.drop_column('document_chunks', 'cmetadata')
+    op.drop_column('document_chunks', 'embedding_model')
+    op.drop_column('document_chunks', 'file_hash')
+    op.drop_column('document_chunks', 'chunk_index')
+    op.drop_column('document_chunks', 'page')
+    op.drop_column('document_chunks', 'source')
+    op.drop_column('document_chunks', 'document_id')
@@ -0,0 +1,37 @@
+"""Normalize chunk embeddings and add an HNSW inner-product index
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Retrieval orders by inner product, which only ranks like cosine on
+    # unit-length vectors (l2_normalize needs pgvector >= 0.7).
+    op.execute("UPDATE document_chunks SET embedding = l2_normalize(embedding) WHERE embedding IS NOT NULL")
+
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        # The IVFFlat cosine index from migrate_document_chunks.py was trained on an
+        # empty table, so its lists are useless; HNSW needs no training.
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_document_chunks_embedding")
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_document_chunks_embedding_hnsw
+            ON document_chunks USING hnsw (embedding vector_ip_ops)
+            WITH (m = 16, ef_construction = 64)
+        """)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_document_chunks_embedding_hnsw")
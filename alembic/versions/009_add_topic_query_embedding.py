@@ -0,0 +1,28 @@
+"""Store each topic's retrieval query embedding
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing topics stay NULL and are filled in on their next summary or quiz
+    op.add_column('topic', sa.Column('query_embedding', Vector(384), nullable=True))
+    op.add_column('topic', sa.Column('query_embedding_model', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('topic', 'query_embedding_model')
+    op.drop_column('topic', 'query_embedding')
@@ -0,0 +1,36 @@
+"""Add a generated tsvector column and GIN index for hybrid retrieval
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Kept in sync by Postgres on every insert, including the bulk COPY path
+    op.execute("""
+        ALTER TABLE document_chunks
+        ADD COLUMN IF NOT EXISTS content_tsv tsvector
+        GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED
+    """)
+
+    with op.get_context().autocommit_block():
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_document_chunks_content_tsv
+            ON document_chunks USING gin (content_tsv)
+        """)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_document_chunks_content_tsv")
+    op.execute("ALTER TABLE document_chunks DROP COLUMN IF EXISTS content_tsv")
@@ -0,0 +1,24 @@
+"""Add summary_draft to topic for resumable streaming summaries
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '012'
+down_revision = '011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('topic', sa.Column('summary_draft', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('topic', 'summary_draft')
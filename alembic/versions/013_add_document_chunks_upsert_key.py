@@ -0,0 +1,38 @@
+"""Add a unique (document_id, page, chunk_index) key to document_chunks
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '013'
+down_revision = '012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Keep the oldest row of any chunk that was stored twice before the key existed
+    op.execute("""
+        DELETE FROM document_chunks c
+        USING document_chunks older
+        WHERE c.document_id = older.document_id
+          AND c.page = older.page
+          AND c.chunk_index = older.chunk_index
+          AND c.id > older.id
+    """)
+    op.create_index(
+        'uq_document_chunks_document_page_chunk',
+        'document_chunks',
+        ['document_id', 'page', 'chunk_index'],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_document_chunks_document_page_chunk', table_name='document_chunks')
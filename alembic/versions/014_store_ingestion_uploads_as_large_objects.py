@@ -0,0 +1,51 @@
+"""Store queued uploads as large objects instead of bytea
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '014'
+down_revision = '013'
+branch_labels = None
+depends_on = None
+
+
+# Unlinks a row's large object when the row is deleted, including by cascade
+UNLINK_CONTENT_DDL = """
+CREATE OR REPLACE FUNCTION ingestion_job_file_unlink() RETURNS trigger AS $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_largeobject_metadata WHERE oid = OLD.content_oid) THEN
+        PERFORM lo_unlink(OLD.content_oid);
+    END IF;
+    RETURN OLD;
+END $$ LANGUAGE plpgsql;
+
+CREATE TRIGGER ingestion_job_file_unlink
+AFTER DELETE ON ingestion_job_file
+FOR EACH ROW EXECUTE PROCEDURE ingestion_job_file_unlink();
+"""
+
+
+def upgrade() -> None:
+    op.add_column('ingestion_job_file', sa.Column('content_oid', postgresql.OID(), nullable=True))
+    op.execute("UPDATE ingestion_job_file SET content_oid = lo_from_bytea(0, content)")
+    op.alter_column('ingestion_job_file', 'content_oid', nullable=False)
+    op.drop_column('ingestion_job_file', 'content')
+    op.execute(UNLINK_CONTENT_DDL)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS ingestion_job_file_unlink ON ingestion_job_file")
+    op.execute("DROP FUNCTION IF EXISTS ingestion_job_file_unlink()")
+    op.add_column('ingestion_job_file', sa.Column('content', sa.LargeBinary(), nullable=True))
+    op.execute("UPDATE ingestion_job_file SET content = lo_get(content_oid)")
+    op.execute("SELECT lo_unlink(content_oid) FROM ingestion_job_file")
+    op.alter_column('ingestion_job_file', 'content', nullable=False)
+    op.drop_column('ingestion_job_file', 'content_oid')
@@ -11,10 +11,15 @@ from fastapi_users import FastAPIUsers
 from fastapi_users.authentication import CookieTransport, JWTStrategy, AuthenticationBackend
 from core.user_manager import get_user_manager
 from core.db import init_db
+from services.pdf_service import shutdown_parse_pool
+from services.ingestion_worker import run_worker_loop
+from services.progress_service import progress_broker
+from services.vector_store import dispose_engine
+import asyncio
 from models import User, Pathway
 from models.user import google_oauth_client
 from schemas.user import UserRead, UserCreate, UserUpdate
-from routes import learning_paths, topics
+from routes import admin, learning_paths, topics
 from fastapi.responses import FileResponse
 
 load_dotenv()
@@ -48,9 +53,28 @@ app.add_middleware(
     expose_headers=["Content-Type"],
 )
 
+# Ingestion normally runs in worker.py on separate nodes; set this to also
+# run a worker inside the API process (handy for local development).
+RUN_INGESTION_WORKER = os.getenv("RUN_INGESTION_WORKER", "false").lower() == "true"
+
 @app.on_event("startup")
 async def on_startup():
     await init_db()
+    if RUN_INGESTION_WORKER:
+        app.state.worker_stop = asyncio.Event()
+        app.state.worker_task = asyncio.create_task(run_worker_loop(app.state.worker_stop))
+    else:
+        print("⚠️ RUN_INGESTION_WORKER is off: uploads stay QUEUED until `python worker.py` is running.")
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    if RUN_INGESTION_WORKER:
+        app.state.worker_stop.set()
+        await app.state.worker_task
+    shutdown_parse_pool()
+    await progress_broker.close()
+    dispose_engine()
 
 
 app.include_router(fastapi_users.get_auth_router(auth_backend), prefix="/auth/jwt", tags=["auth"])
@@ -95,6 +119,7 @@ async def favicon():
     return Response(status_code=204)
 app.include_router(learning_paths.router)
 app.include_router(topics.router)
+app.include_router(admin.router)
 
 @app.get("/")
 async def root():
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Builds, drops or inspects the ANN index on document_chunks.embedding without
+blocking ingestion (CREATE/DROP INDEX CONCURRENTLY):
+
+    python manage_vector_index.py status
+    python manage_vector_index.py create --kind ivfflat
+    python manage_vector_index.py drop --kind hnsw
+"""
+import argparse
+
+from services.vector_store import (
+    VECTOR_INDEX_NAMES,
+    VECTOR_INDEX_TYPE,
+    create_vector_index,
+    drop_vector_index,
+    vector_index_status,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("action", choices=["status", "create", "drop"])
+    parser.add_argument("--kind", choices=sorted(VECTOR_INDEX_NAMES), default=VECTOR_INDEX_TYPE)
+    args = parser.parse_args()
+
+    if args.action == "create":
+        print(f"✓ Built {create_vector_index(args.kind)}")
+    elif args.action == "drop":
+        print(f"✓ Dropped {drop_vector_index(args.kind)}")
+
+    for index in vector_index_status():
+        state = "valid" if index["valid"] else "INVALID"
+        print(f"{index['name']}: {index['type']}, {state}, {index['size_bytes'] / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -44,6 +44,37 @@ async def apply_migration():
             except Exception as e:
                 print(f"document_chunks table: {e}")
             
+            # Columns used by the bulk COPY writer and per-document deletion
+            try:
+                await conn.execute(text("""
+                    ALTER TABLE document_chunks
+                        ADD COLUMN IF NOT EXISTS document_id UUID,
+                        ADD COLUMN IF NOT EXISTS source TEXT,
+                        ADD COLUMN IF NOT EXISTS page INTEGER,
+                        ADD COLUMN IF NOT EXISTS chunk_index INTEGER,
+                        ADD COLUMN IF NOT EXISTS file_hash TEXT,
+                        ADD COLUMN IF NOT EXISTS embedding_model TEXT,
+                        ADD COLUMN IF NOT EXISTS cmetadata JSONB
+                """))
+                print("✓ Added chunk metadata columns")
+            except Exception as e:
+                print(f"chunk metadata columns: {e}")
+
+            # Generated full-text column and its GIN index for hybrid retrieval
+            try:
+                await conn.execute(text("""
+                    ALTER TABLE document_chunks
+                        ADD COLUMN IF NOT EXISTS content_tsv tsvector
+                        GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED
+                """))
+                await conn.execute(text("""
+                    CREATE INDEX IF NOT EXISTS ix_document_chunks_content_tsv
+                    ON document_chunks USING gin (content_tsv)
+                """))
+                print("✓ Added full-text column and GIN index")
+            except Exception as e:
+                print(f"Full-text index: {e}")
+
             # Create index on pathway_id for faster queries
             try:
                 await conn.execute(text("""
@@ -57,9 +88,9 @@ async def apply_migration():
             # Create index on embedding for vector similarity search
             try:
                 await conn.execute(text("""
-                    CREATE INDEX IF NOT EXISTS ix_document_chunks_embedding 
-                    ON document_chunks USING ivfflat (embedding vector_cosine_ops)
-                    WITH (lists = 100)
+                    CREATE INDEX IF NOT EXISTS ix_document_chunks_embedding_hnsw
+                    ON document_chunks USING hnsw (embedding vector_ip_ops)
+                    WITH (m = 16, ef_construction = 64)
                 """))
                 print("✓ Created vector similarity index on embedding")
             except Exception as e:
@@ -2,5 +2,9 @@ from .user import User
 from .pathway import Pathway
 # Also import any other models you have, like 'Topic'
 from .topic import Topic
+from .embedding_cache import EmbeddingCacheEntry
+from .ingestion_job import IngestionJob, IngestionJobFile
+from .pathway_document import PathwayDocument
+from .document_chunk import DocumentChunk
 
-print("Models User and Pathway have been loaded.")
\ No newline at end of file
+print("Models User and Pathway have been loaded.")
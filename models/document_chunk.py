@@ -1,5 +1,6 @@
 from pgvector.sqlalchemy import Vector
-from sqlalchemy import Column, Integer, Text, ForeignKey, UUID
+from sqlalchemy import Column, Computed, Index, Integer, Text, ForeignKey, UUID
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 
 from models.base import Base
 
@@ -7,7 +8,30 @@ from models.base import Base
 class DocumentChunk(Base):
     __tablename__ = "document_chunks"
     id = Column(Integer, primary_key=True)
-    pathway_id = Column(UUID(as_uuid=True), ForeignKey("pathway.id", ondelete="CASCADE"))
+    pathway_id = Column(UUID(as_uuid=True), ForeignKey("pathway.id", ondelete="CASCADE"), index=True)
+    document_id = Column(UUID(as_uuid=True), ForeignKey("pathway_document.id", ondelete="CASCADE"), index=True)
     content = Column(Text)
     # 384 matches your 'all-MiniLM-L6-v2' model dimensions
-    embedding = Column(Vector(384))
\ No newline at end of file
+    embedding = Column(Vector(384))
+    source = Column(Text)
+    page = Column(Integer)
+    chunk_index = Column(Integer)
+    file_hash = Column(Text)
+    embedding_model = Column(Text)
+    cmetadata = Column(JSONB)
+    # Full-text leg of hybrid retrieval; generated, never written by the app
+    content_tsv = Column(TSVECTOR, Computed("to_tsvector('english', coalesce(content, ''))", persisted=True))
+
+    # Embeddings are stored unit-length, so inner product ranks like cosine
+    __table_args__ = (
+        Index(
+            "ix_document_chunks_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "vector_ip_ops"},
+        ),
+        Index("ix_document_chunks_content_tsv", "content_tsv", postgresql_using="gin"),
+        # Upsert key of the bulk writer: a replayed ingestion batch inserts nothing twice
+        Index("uq_document_chunks_document_page_chunk", "document_id", "page", "chunk_index", unique=True),
+    )
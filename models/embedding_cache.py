@@ -0,0 +1,18 @@
+from datetime import datetime
+
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import String, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+
+from models.base import Base
+
+
+class EmbeddingCacheEntry(Base):
+    """Content-addressed embedding: sha256(model name + normalized chunk text) -> vector."""
+    __tablename__ = "embedding_cache"
+
+    content_hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    model: Mapped[str] = mapped_column(String, nullable=False)
+    # 384 matches the 'all-MiniLM-L6-v2' model dimensions
+    embedding = mapped_column(Vector(384), nullable=False)
+    created: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
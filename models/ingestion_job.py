@@ -0,0 +1,88 @@
+import enum
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DDL, String, Integer, DateTime, ForeignKey, Text, JSON, Enum as SQLEnum, event
+from sqlalchemy.dialects.postgresql import OID
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from models.base import Base
+
+
+class JobStatus(enum.Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_job"
+
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
+    pathway_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("pathway.id", ondelete="CASCADE"), index=True)
+    status: Mapped[JobStatus] = mapped_column(SQLEnum(JobStatus), default=JobStatus.QUEUED, index=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+
+    # Batches committed so far, across attempts; a reclaimed job resumes after them
+    batches_done: Mapped[int] = mapped_column(Integer, default=0)
+    chunks_stored: Mapped[int] = mapped_column(Integer, default=0)
+    # Latest progress snapshot (pages parsed, chunks embedded, ETA, ...)
+    progress: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+
+    # Lease: a RUNNING job whose heartbeat is older than the lease is reclaimed
+    locked_by: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    created: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    updated: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+    files = relationship(
+        "IngestionJobFile",
+        back_populates="job",
+        cascade="all, delete-orphan",
+        order_by="IngestionJobFile.position",
+    )
+
+
+class IngestionJobFile(Base):
+    """
+    Uploaded PDF kept in Postgres until its job finishes, so a restart loses
+    nothing. The bytes live in a large object, written and read in blocks;
+    a trigger unlinks it when the row is deleted (also by cascade).
+    """
+    __tablename__ = "ingestion_job_file"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    job_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("ingestion_job.id", ondelete="CASCADE"), index=True)
+    position: Mapped[int] = mapped_column(Integer)
+    filename: Mapped[str] = mapped_column(String)
+    document_id: Mapped[Optional[uuid.UUID]] = mapped_column(
+        ForeignKey("pathway_document.id", ondelete="CASCADE"), nullable=True
+    )
+    content_oid: Mapped[int] = mapped_column(OID)
+
+    job = relationship("IngestionJob", back_populates="files")
+
+
+# Same trigger as migration 014, for databases built with create_all
+UNLINK_CONTENT_DDL = """
+CREATE OR REPLACE FUNCTION ingestion_job_file_unlink() RETURNS trigger AS $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_largeobject_metadata WHERE oid = OLD.content_oid) THEN
+        PERFORM lo_unlink(OLD.content_oid);
+    END IF;
+    RETURN OLD;
+END $$ LANGUAGE plpgsql;
+
+CREATE TRIGGER ingestion_job_file_unlink
+AFTER DELETE ON ingestion_job_file
+FOR EACH ROW EXECUTE PROCEDURE ingestion_job_file_unlink();
+"""
+
+event.listen(
+    IngestionJobFile.__table__,
+    "after_create",
+    DDL(UNLINK_CONTENT_DDL).execute_if(dialect="postgresql"),
+)
@@ -23,6 +23,9 @@ class Pathway(Base):
     user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("user.id"), nullable=False)
 
     embedding_status: Mapped[EmbeddingStatus] = mapped_column(SQLEnum(EmbeddingStatus), default=EmbeddingStatus.PENDING)
+    # Bumped whenever the pathway's chunks change; part of every retrieval cache key
+    collection_version: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
 
     user = relationship("User", back_populates="pathways")
     topics = relationship("Topic", back_populates="pathway", cascade="all, delete-orphan")
+    documents = relationship("PathwayDocument", back_populates="pathway", cascade="all, delete-orphan")
@@ -0,0 +1,23 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import String, Integer, DateTime, ForeignKey, UniqueConstraint, Enum as SQLEnum
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from models.base import Base
+from models.pathway import EmbeddingStatus
+
+
+class PathwayDocument(Base):
+    """One uploaded PDF inside a pathway; its chunks carry this id in their metadata."""
+    __tablename__ = "pathway_document"
+    __table_args__ = (UniqueConstraint("pathway_id", "file_hash", name="uq_pathway_document_hash"),)
+
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
+    pathway_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("pathway.id", ondelete="CASCADE"), index=True)
+    filename: Mapped[str] = mapped_column(String, nullable=False)
+    file_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    chunk_count: Mapped[int] = mapped_column(Integer, default=0)
+    embedding_status: Mapped[EmbeddingStatus] = mapped_column(SQLEnum(EmbeddingStatus), default=EmbeddingStatus.PROCESSING)
+    created: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+
+    pathway = relationship("Pathway", back_populates="documents")
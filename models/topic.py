@@ -6,6 +6,7 @@ from sqlalchemy import Enum as SQLEnum
 
 from sqlalchemy import Column, Integer, Text, String, DateTime, ForeignKey, JSON
 from sqlalchemy.orm import relationship, Mapped, mapped_column
+from pgvector.sqlalchemy import Vector
 from models.base import Base
 from models.enums import Status
 
@@ -21,5 +22,10 @@ class Topic(Base):
     keywords: Mapped[List[str]] = mapped_column(JSON, nullable=True)
     pathway_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("pathway.id"), nullable=False)
     summary = Column(Text, nullable=True)
+    # Markdown saved while a summary is still streaming; resumed instead of regenerated
+    summary_draft = Column(Text, nullable=True)
+    # Retrieval vector for "name + keywords", embedded once when the topic is created
+    query_embedding = Column(Vector(384), nullable=True)
+    query_embedding_model = Column(String, nullable=True)
 
     pathway = relationship("Pathway", back_populates="topics")
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends
+
+from core.auth import fastapi_users
+from models import User
+from services.metrics_service import collect_metrics
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+@router.get("/metrics")
+async def get_metrics(user: User = Depends(fastapi_users.current_user(active=True, superuser=True))):
+    """
+    Process-local counters: vector-store pool, embedding and retrieval caches,
+    hot index, near-duplicate filter, answer cache and LLM gateway. Each API
+    or worker process reports its own numbers.
+    """
+    return collect_metrics()
@@ -1,28 +1,40 @@
 import uuid
+import json
+import asyncio
 from typing import List
 from uuid import UUID
 
 from google.generativeai import retriever
 from langchain_classic.chains import llm
 from sqlalchemy import select
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Request
+from fastapi.responses import StreamingResponse
 from core.auth import fastapi_users
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-from core.db import get_session
+from core.db import get_session, get_session_context
 from models.enums import Status
 from models.pathway import EmbeddingStatus
 from schemas.pathway_create import PathwayCreate, PathwayResponse
 from services.pathway_service import save_pathway_to_db
 from services.llm_service import generate_structured_pathway
+from services.llm_gateway import LLMUnavailableError
 from schemas.pathway_status import PathwayStatusResponse
+from schemas.pathway_prepare import PathwayPrepareResponse, TopicContextResponse
 from models import User, Pathway, Topic
-from services.rag_service import process_and_embed_pdfs
+from services.ingestion_worker import enqueue_ingestion_job
+from services.document_service import register_documents, list_documents, delete_document, refresh_pathway_status
+from services.upload_service import receive_pdf_uploads, UploadRejected
+from services.progress_service import progress_broker, TERMINAL_STATUSES
+from services.topic_embedding_service import prepare_pathway_context
+from services.context_service import CONTEXT_MAX_DISTANCE
+from models.ingestion_job import IngestionJob, JobStatus
+from schemas.document import DocumentResponse
 from schemas.topic_create import TopicResponse
 from services.quiz_service import generate_quiz
 from schemas.quiz_request import QuizRequest
 from schemas.chat_request import ChatRequest, ChatResponse
-from services.rag_service import chat_with_pathway_pdfs
+from services.rag_service import chat_with_pathway_pdfs, stream_chat_with_pathway_pdfs
 router = APIRouter(prefix="/pathways", tags=["Pathways"])
 
 @router.get("/", response_model=List[PathwayResponse])
@@ -82,6 +94,8 @@ async def generate_and_save_pathway(
     try:
         llm_data = await generate_structured_pathway(user_topics, pathway_name)
         pathway_schema = PathwayCreate(**llm_data)
+    except LLMUnavailableError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"LLM Error or invalid response: {e}")
 
@@ -157,14 +171,17 @@ async def get_pathway_status(
 )
 async def upload_pdfs_for_pathway(
         pathway_id: uuid.UUID,
-        background_tasks: BackgroundTasks,
         files: List[UploadFile] = File(...),
         db: AsyncSession = Depends(get_session),
         user: User = Depends(fastapi_users.current_user()),
 ):
     """
     Uploads up to 4 PDFs for a specific pathway.
-    This triggers a background task to process and embed the files.
+    New documents are appended to the existing pathway collection; files
+    whose content the pathway already holds are skipped.
+    The files are stored with a durable ingestion job that an ingestion
+    worker (worker.py) claims, so a restart mid-ingest resumes instead of
+    leaving the pathway stuck in PROCESSING.
     """
     # 1. Check file limit
     if len(files) > 4:
@@ -184,27 +201,219 @@ async def upload_pdfs_for_pathway(
             detail="Pathway not found or you do not have permission."
         )
 
-    # 3. Set status to PROCESSING
-    pathway.embedding_status = EmbeddingStatus.PROCESSING
-    db.add(pathway)
-    await db.commit()
-
-    # 4. Read file contents and schedule the background task
-    # We must read the files now, as the UploadFile object
-    # will be closed after this request ends.
-    file_contents = []
-    for file in files:
-        contents = await file.read()
-        file_contents.append((file.filename, contents))
-
-    background_tasks.add_task(
-        process_and_embed_pdfs, pathway_id, file_contents
-    )
+    # 3. Stream each file into a size-capped spool, hashing as it arrives, and
+    # reject bad files (not a PDF, encrypted, too large, too many pages)
+    # before anything is queued.
+    try:
+        uploads = await receive_pdf_uploads(files)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    try:
+        # 4. Register one document per new file; already-ingested content is skipped
+        to_ingest, skipped = await register_documents(
+            db, pathway_id, [(u.filename, u.file, u.file_hash) for u in uploads]
+        )
+
+        if not to_ingest:
+            await db.commit()
+            return {
+                "message": "All files are already part of this pathway.",
+                "pathway_id": pathway_id,
+                "skipped": skipped,
+                "embedding_status": pathway.embedding_status
+            }
+
+        # 5. Enqueue the ingestion job. A pathway that already has searchable
+        # documents stays COMPLETED (chat, summaries and quizzes keep working);
+        # otherwise it moves to PROCESSING
+        await refresh_pathway_status(db, pathway_id)
+
+        job = await enqueue_ingestion_job(
+            db, pathway_id, [(filename, source, doc.id) for filename, source, doc in to_ingest]
+        )
+    finally:
+        for upload in uploads:
+            upload.close()
 
     return {
         "message": "Files accepted. Processing has started in the background.",
         "pathway_id": pathway_id,
-        "embedding_status": EmbeddingStatus.PROCESSING
+        "job_id": job.id,
+        "document_ids": [doc.id for _, _, doc in to_ingest],
+        "skipped": skipped,
+        "embedding_status": pathway.embedding_status
+    }
+
+
+# A pathway stays COMPLETED while documents are appended, so progress follows the job
+_JOB_PROGRESS_STATUS = {
+    JobStatus.QUEUED: EmbeddingStatus.PROCESSING.value,
+    JobStatus.RUNNING: EmbeddingStatus.PROCESSING.value,
+    JobStatus.COMPLETED: EmbeddingStatus.COMPLETED.value,
+    JobStatus.FAILED: EmbeddingStatus.FAILED.value,
+}
+
+
+async def _progress_snapshot(pathway_id: uuid.UUID) -> dict:
+    """The latest stored progress and status of the pathway's newest ingestion job."""
+    job_query = (
+        select(IngestionJob)
+        .where(IngestionJob.pathway_id == pathway_id)
+        .order_by(IngestionJob.created.desc())
+        .limit(1)
+    )
+    # Own session: the request's session is closed once streaming starts
+    async with get_session_context() as db:
+        pathway = await db.get(Pathway, pathway_id)
+        job = (await db.execute(job_query)).scalar_one_or_none()
+
+    snapshot = {"pathway_id": str(pathway_id), "status": pathway.embedding_status.value}
+    if job:
+        snapshot.update(job.progress or {}, job_id=str(job.id))
+        # The stored progress can predate the job's final status
+        snapshot["status"] = _JOB_PROGRESS_STATUS[job.status]
+    snapshot["pathway_status"] = pathway.embedding_status.value
+    return snapshot
+
+
+@router.get("/{pathway_id}/progress")
+async def stream_pathway_progress(
+        pathway_id: uuid.UUID,
+        request: Request,
+        db: AsyncSession = Depends(get_session),
+        user: User = Depends(fastapi_users.current_user()),
+):
+    """
+    Server-sent events with live ingestion progress for a pathway: pages parsed,
+    chunks sanitized/embedded, batches retried and ETA. The stream starts with
+    the latest stored snapshot and closes once ingestion COMPLETED or FAILED.
+    """
+    query = select(Pathway).where(Pathway.id == pathway_id, Pathway.user_id == user.id)
+    result = await db.execute(query)
+    pathway = result.scalar_one_or_none()
+
+    if not pathway:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Pathway not found or you do not have permission."
+        )
+
+    async def event_stream():
+        # Subscribe before reading the stored snapshot, so a job finishing in
+        # between still delivers its final event to this stream
+        async with progress_broker.subscribe(pathway_id) as events:
+            snapshot = await _progress_snapshot(pathway_id)
+            yield f"event: progress\ndata: {json.dumps(snapshot)}\n\n"
+            if snapshot["status"] in TERMINAL_STATUSES or snapshot["status"] == EmbeddingStatus.PENDING.value:
+                return
+
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # A missed NOTIFY (e.g. across a broker reconnect) must not leave the stream open forever
+                    event = await _progress_snapshot(pathway_id)
+                    if event["status"] not in TERMINAL_STATUSES:
+                        # Keeps proxies from closing an idle connection
+                        yield ": keep-alive\n\n"
+                        continue
+                yield f"event: progress\ndata: {json.dumps(event)}\n\n"
+                if event.get("status") in TERMINAL_STATUSES:
+                    return
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/{pathway_id}/prepare", response_model=PathwayPrepareResponse)
+async def prepare_pathway(
+        pathway_id: uuid.UUID,
+        db: AsyncSession = Depends(get_session),
+        user: User = Depends(fastapi_users.current_user()),
+):
+    """
+    Retrieves study material for every topic of the pathway in one query and
+    caches it for the summary and quiz endpoints. Reports how many chunks
+    each topic matched, so topics the PDFs do not cover can be flagged.
+    """
+    query = select(Pathway).where(Pathway.id == pathway_id, Pathway.user_id == user.id)
+    result = await db.execute(query)
+    pathway = result.scalar_one_or_none()
+
+    if not pathway:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Pathway not found or you do not have permission."
+        )
+
+    if pathway.embedding_status != EmbeddingStatus.COMPLETED:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Study materials are still being processed. Please wait."
+        )
+
+    context = await prepare_pathway_context(pathway_id)
+    matched = {
+        topic_id: sum(1 for _, distance in results if distance <= CONTEXT_MAX_DISTANCE)
+        for topic_id, results in context.items()
+    }
+    return PathwayPrepareResponse(
+        pathway_id=pathway_id,
+        collection_version=pathway.collection_version,
+        topics=[TopicContextResponse(topic_id=topic_id, matched_chunks=count) for topic_id, count in matched.items()],
+        topics_without_context=[topic_id for topic_id, count in matched.items() if not count],
+    )
+
+
+@router.get("/{pathway_id}/documents", response_model=List[DocumentResponse])
+async def get_pathway_documents(
+        pathway_id: uuid.UUID,
+        db: AsyncSession = Depends(get_session),
+        user: User = Depends(fastapi_users.current_user()),
+):
+    """Lists the documents ingested into a pathway."""
+    query = select(Pathway).where(Pathway.id == pathway_id, Pathway.user_id == user.id)
+    result = await db.execute(query)
+    if not result.scalar_one_or_none():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Pathway not found or you do not have permission."
+        )
+
+    return await list_documents(db, pathway_id)
+
+
+@router.delete("/{pathway_id}/documents/{document_id}")
+async def delete_pathway_document(
+        pathway_id: uuid.UUID,
+        document_id: uuid.UUID,
+        db: AsyncSession = Depends(get_session),
+        user: User = Depends(fastapi_users.current_user()),
+):
+    """Removes a single document and its vectors without re-embedding the rest."""
+    query = select(Pathway).where(Pathway.id == pathway_id, Pathway.user_id == user.id)
+    result = await db.execute(query)
+    if not result.scalar_one_or_none():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Pathway not found or you do not have permission."
+        )
+
+    deleted_chunks = await delete_document(db, pathway_id, document_id)
+    if deleted_chunks is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found in this pathway."
+        )
+
+    return {
+        "message": "Document removed.",
+        "document_id": document_id,
+        "deleted_chunks": deleted_chunks
     }
 
 @router.post("/generate-quiz")
@@ -218,7 +427,10 @@ async def quiz_generate(data: QuizRequest, db: AsyncSession = Depends(get_sessio
     topic = result.scalar_one_or_none()
 
 
-    quiz = await generate_quiz(topic, data.difficulty, data.num_questions)
+    try:
+        quiz = await generate_quiz(topic, data.difficulty, data.num_questions)
+    except LLMUnavailableError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
     return quiz
 
 
@@ -256,8 +468,11 @@ async def chat_pathway(
         answer = await chat_with_pathway_pdfs(
             pathway_id=pathway_id,
             user_query=data.message,
-            chat_history=data.history  # This is the List[ChatMessage] from your schema
+            chat_history=data.history,  # This is the List[ChatMessage] from your schema
+            collection_version=pathway.collection_version,
         )
+    except LLMUnavailableError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
     except Exception as e:
         # Log the error properly in a real app
         raise HTTPException(
@@ -272,4 +487,53 @@ async def chat_pathway(
     )
 
 
+@router.post("/{pathway_id}/chat/stream")
+async def chat_pathway_stream(
+        pathway_id: uuid.UUID,
+        data: ChatRequest,
+        request: Request,
+        user: User = Depends(fastapi_users.current_user()),
+        db: AsyncSession = Depends(get_session)
+):
+    """
+    Streaming variant of /chat: server-sent "token" events as the answer is
+    generated, then a "done" event with sources and timings (or "error").
+    """
+    query = select(Pathway).where(Pathway.id == pathway_id, Pathway.user_id == user.id)
+    result = await db.execute(query)
+    pathway = result.scalar_one_or_none()
+
+    if not pathway:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Pathway not found or access denied."
+        )
+
+    if pathway.embedding_status != EmbeddingStatus.COMPLETED:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Study materials are still being processed. Please wait."
+        )
+
+    events = stream_chat_with_pathway_pdfs(
+        pathway_id=pathway_id,
+        user_query=data.message,
+        chat_history=data.history,
+        collection_version=pathway.collection_version,
+    )
 
+    async def event_stream():
+        try:
+            async for event, payload in events:
+                if await request.is_disconnected():
+                    # Stops generation (and LLM spend) when the client goes away
+                    return
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
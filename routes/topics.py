@@ -1,6 +1,8 @@
+import json
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
@@ -9,7 +11,8 @@ from core.db import get_session
 from core.auth import fastapi_users
 from models import User, Topic, Pathway
 from models.pathway import EmbeddingStatus
-from services.rag_service import generate_summary_for_topic
+from services.rag_service import generate_summary_for_topic, stream_summary_for_topic
+from services.llm_gateway import LLMUnavailableError
 from uuid import UUID
 from models.enums import Status
 from datetime import datetime, timezone
@@ -63,16 +66,78 @@ async def get_topic_summary(
         )
 
     # 5. Generate the summary
-    summary = await generate_summary_for_topic(topic)
+    try:
+        summary = await generate_summary_for_topic(topic)
+    except LLMUnavailableError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
 
     # --- SAVE TO DB START ---
-    # 6. Store the newly generated summary so next time is instant
+    # 6. Store the newly generated summary so next time is instant; a draft
+    # left by an interrupted stream must not be resumed over it
     topic.summary = summary
+    topic.summary_draft = None
     await db.commit()
     # --- SAVE TO DB END ---
 
     return SummaryResponse(topic_id=topic_id, summary=summary)
 
+
+@router.get("/{topic_id}/summary/stream")
+async def stream_topic_summary(
+        topic_id: int,
+        request: Request,
+        db: AsyncSession = Depends(get_session),
+        user: User = Depends(fastapi_users.current_user()),
+):
+    """
+    Server-sent events with the study guide as it is written: "token" events
+    carrying Markdown, then "done" (or "error"). Progress is saved as it
+    streams, so reconnecting after a drop replays the saved part and only
+    generates the rest. A finished summary is sent in a single token event.
+    """
+    query = (
+        select(Topic)
+        .options(selectinload(Topic.pathway))
+        .where(Topic.id == topic_id)
+    )
+    result = await db.execute(query)
+    topic = result.scalar_one_or_none()
+
+    if not topic:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Topic not found.")
+
+    if topic.pathway.user_id != user.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized.")
+
+    if not topic.summary and topic.pathway.embedding_status != EmbeddingStatus.COMPLETED:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Embeddings are not ready. Current status: {topic.pathway.embedding_status.value}"
+        )
+
+    async def finished_summary():
+        yield "token", {"content": topic.summary}
+        yield "done", {"resumed": False, "length": len(topic.summary), "elapsed_ms": 0}
+
+    events = finished_summary() if topic.summary else stream_summary_for_topic(topic)
+
+    async def event_stream():
+        try:
+            async for event, payload in events:
+                if await request.is_disconnected():
+                    # The draft saved so far is kept for the next request
+                    return
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # Endpoint to mark a topic as complete
 
 @router.post("/{topic_id}/complete")
@@ -0,0 +1,16 @@
+import uuid
+from datetime import datetime
+from pydantic import BaseModel
+from models.pathway import EmbeddingStatus
+
+
+class DocumentResponse(BaseModel):
+    id: uuid.UUID
+    filename: str
+    file_hash: str
+    chunk_count: int
+    embedding_status: EmbeddingStatus
+    created: datetime
+
+    class Config:
+        from_attributes = True
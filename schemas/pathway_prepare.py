@@ -0,0 +1,17 @@
+import uuid
+from typing import List, Optional
+from pydantic import BaseModel
+
+
+class TopicContextResponse(BaseModel):
+    topic_id: int
+    # Retrieved chunks close enough to be used as context (CONTEXT_MAX_DISTANCE)
+    matched_chunks: int
+
+
+class PathwayPrepareResponse(BaseModel):
+    pathway_id: uuid.UUID
+    collection_version: Optional[int]
+    topics: List[TopicContextResponse]
+    # Topics the uploaded material does not cover; their summaries will be empty
+    topics_without_context: List[int]
@@ -0,0 +1,101 @@
+import os
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# ---------------- CONFIG ----------------
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+# Cosine similarity a new question needs with a cached one to reuse its answer
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+ANSWER_CACHE_PER_PATHWAY = int(os.getenv("ANSWER_CACHE_PER_PATHWAY", "256"))
+ANSWER_CACHE_PATHWAYS = int(os.getenv("ANSWER_CACHE_PATHWAYS", "512"))
+
+
+class _PathwayAnswers:
+    """One pathway's cached questions as unit vectors, oldest first."""
+
+    def __init__(self, version: int):
+        self.version = version
+        self.vectors: List[np.ndarray] = []
+        self.entries: List[dict] = []
+
+    def lookup(self, vector: np.ndarray, threshold: float) -> Optional[dict]:
+        if not self.vectors:
+            return None
+        scores = np.vstack(self.vectors) @ vector
+        best = int(np.argmax(scores))
+        return self.entries[best] if scores[best] >= threshold else None
+
+    def add(self, vector: np.ndarray, entry: dict):
+        self.vectors.append(vector)
+        self.entries.append(entry)
+        if len(self.entries) > ANSWER_CACHE_PER_PATHWAY:
+            del self.vectors[0], self.entries[0]
+
+
+def _unit(vector: Sequence[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm > 0 else array
+
+
+class AnswerCache:
+    """
+    Per-pathway semantic cache of chat answers: a first-turn question whose
+    embedding is within ANSWER_CACHE_SIMILARITY of an earlier one gets that
+    answer back without retrieval or an LLM call. Each pathway's entries carry
+    its collection_version; a lookup or store with a newer version (after
+    ingestion or document removal) drops the old answers. Pathways are kept
+    in LRU order up to ANSWER_CACHE_PATHWAYS.
+    """
+
+    def __init__(self, threshold: float = ANSWER_CACHE_SIMILARITY, max_pathways: int = ANSWER_CACHE_PATHWAYS):
+        self.threshold = threshold
+        self.max_pathways = max_pathways
+        self._lock = threading.Lock()
+        self._pathways: "OrderedDict[uuid.UUID, _PathwayAnswers]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "invalidated": 0}
+
+    def _pathway(self, pathway_id: uuid.UUID, version: int, create: bool) -> Optional[_PathwayAnswers]:
+        answers = self._pathways.get(pathway_id)
+        if answers is not None and answers.version != version:
+            del self._pathways[pathway_id]
+            self._stats["invalidated"] += 1
+            answers = None
+        if answers is None and create:
+            answers = self._pathways[pathway_id] = _PathwayAnswers(version)
+            while len(self._pathways) > self.max_pathways:
+                self._pathways.popitem(last=False)
+        if answers is not None:
+            self._pathways.move_to_end(pathway_id)
+        return answers
+
+    def get(self, pathway_id: uuid.UUID, version: int, vector: Sequence[float]) -> Optional[dict]:
+        with self._lock:
+            answers = self._pathway(pathway_id, version, create=False)
+            entry = answers.lookup(_unit(vector), self.threshold) if answers else None
+            self._stats["hits" if entry else "misses"] += 1
+            return dict(entry) if entry else None
+
+    def put(self, pathway_id: uuid.UUID, version: int, vector: Sequence[float], question: str, answer: str,
+            sources: Optional[list] = None):
+        with self._lock:
+            self._pathway(pathway_id, version, create=True).add(
+                _unit(vector), {"question": question, "answer": answer, "sources": list(sources or [])}
+            )
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pathways"] = len(self._pathways)
+            stats["entries"] = sum(len(a.entries) for a in self._pathways.values())
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+answer_cache = AnswerCache()
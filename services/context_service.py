@@ -0,0 +1,102 @@
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from services.pdf_service import CHUNK_OVERLAP
+from services.dedup_service import MinHashDeduplicator, NEAR_DUP_THRESHOLD
+
+# ---------------- CONFIG ----------------
+
+# Cosine distance above which a retrieved chunk is considered a weak match
+CONTEXT_MAX_DISTANCE = float(os.getenv("CONTEXT_MAX_DISTANCE", "0.65"))
+# Chunks kept even if all of them are weak, so a question never gets zero context
+CONTEXT_MIN_CHUNKS = int(os.getenv("CONTEXT_MIN_CHUNKS", "1"))
+# Prompt budget for retrieved context, in estimated tokens (~4 characters each)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+CHARS_PER_TOKEN = 4
+# Shorter suffix/prefix matches between neighbours are treated as coincidence
+MIN_OVERLAP_CHARS = 20
+
+
+def estimate_tokens(content: str) -> int:
+    return len(content) // CHARS_PER_TOKEN + 1
+
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of `left` that is a prefix of `right`."""
+    for size in range(min(len(left), len(right), CHUNK_OVERLAP * 2), MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _position(doc: Document) -> Tuple[str, Optional[int], Optional[int]]:
+    metadata = doc.metadata
+    return metadata.get("file_hash") or metadata.get("source") or "", metadata.get("page"), metadata.get("chunk_index")
+
+
+def merge_adjacent(docs: Sequence[Document]) -> List[Document]:
+    """
+    Joins chunks that were split next to each other from the same page,
+    dropping the splitter's repeated overlap. The merged chunk takes the
+    rank of its best-ranked part.
+    """
+    runs: Dict[Tuple[str, Optional[int]], List[Tuple[int, Document]]] = {}
+    for rank, doc in enumerate(docs):
+        file_key, page, _ = _position(doc)
+        runs.setdefault((file_key, page), []).append((rank, doc))
+
+    merged: List[Tuple[int, Document]] = []
+    for members in runs.values():
+        members.sort(key=lambda m: (_position(m[1])[2] is None, _position(m[1])[2] or 0))
+        current_rank, current = members[0]
+        for rank, doc in members[1:]:
+            previous_index, index = _position(current)[2], _position(doc)[2]
+            if previous_index is not None and index == previous_index + 1:
+                content = current.page_content + doc.page_content[_overlap(current.page_content, doc.page_content):]
+                # chunk_index moves to the last part so a third neighbour can still join
+                current = Document(page_content=content, metadata={**current.metadata, "chunk_index": index})
+                current_rank = min(current_rank, rank)
+            else:
+                merged.append((current_rank, current))
+                current_rank, current = rank, doc
+        merged.append((current_rank, current))
+
+    return [doc for _, doc in sorted(merged, key=lambda m: m[0])]
+
+
+def optimize_context(
+        results: Sequence[Tuple[Document, float]],
+        max_distance: Optional[float] = CONTEXT_MAX_DISTANCE,
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+) -> List[Document]:
+    """
+    Turns ranked (chunk, distance) results into the chunks worth sending to the LLM:
+      1. cut weak matches above `max_distance` (None disables the cut-off),
+         keeping at least CONTEXT_MIN_CHUNKS;
+      2. drop near-duplicates (repeated slides, headers);
+      3. merge neighbouring chunks of the same page without their overlap;
+      4. pack by rank into `token_budget`, skipping chunks that no longer fit.
+    """
+    docs = [
+        doc for rank, (doc, score) in enumerate(results)
+        if max_distance is None or score <= max_distance or rank < CONTEXT_MIN_CHUNKS
+    ]
+
+    deduplicator = MinHashDeduplicator(NEAR_DUP_THRESHOLD) if NEAR_DUP_THRESHOLD > 0 else None
+    if deduplicator:
+        docs = [doc for doc in docs if not deduplicator.is_duplicate(doc.page_content)]
+
+    packed, used = [], 0
+    for doc in merge_adjacent(docs):
+        cost = estimate_tokens(doc.page_content)
+        if used + cost > token_budget and packed:
+            continue
+        packed.append(doc)
+        used += cost
+    return packed
+
+
+def join_context(docs: Sequence[Document]) -> str:
+    return "\n\n".join(doc.page_content for doc in docs)
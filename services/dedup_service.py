@@ -0,0 +1,144 @@
+import os
+import re
+import hashlib
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+# ---------------- CONFIG ----------------
+
+# Estimated Jaccard similarity at or above which a chunk is dropped; 0 disables the stage
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.85"))
+NUM_PERMUTATIONS = 64
+SHINGLE_WORDS = 3
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 31, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+_WORD_RE = re.compile(r"\w+")
+_DIGITS_RE = re.compile(r"\d+")
+
+
+# Process-wide totals across ingestion runs; per-run counts go to the run's stats
+_stats_lock = threading.Lock()
+_stats = {"chunks_checked": 0, "chunks_dropped": 0}
+
+
+def _count(**deltas: int):
+    with _stats_lock:
+        for key, delta in deltas.items():
+            _stats[key] += delta
+
+
+def dedup_stats() -> Dict[str, float]:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["drop_rate"] = stats["chunks_dropped"] / stats["chunks_checked"] if stats["chunks_checked"] else 0.0
+    stats["threshold"] = NEAR_DUP_THRESHOLD
+    return stats
+
+
+def shingle_set(content: str) -> np.ndarray:
+    """Sorted, unique 32-bit hashes of the content's word 3-grams."""
+    # Digits are folded so "Page 3" / "Page 4" footers and slide numbers match
+    words = _WORD_RE.findall(_DIGITS_RE.sub("0", content.lower()))
+    if len(words) < SHINGLE_WORDS:
+        grams = [" ".join(words)]
+    else:
+        grams = [" ".join(words[i: i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+    hashes = [int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=4).digest(), "little") for g in set(grams)]
+    return np.unique(np.array(hashes, dtype=np.uint32))
+
+
+def _signature(shingles: np.ndarray) -> np.ndarray:
+    # (a * x + b) mod p for every permutation x shingle, then the minimum per permutation
+    hashed = (np.outer(shingles.astype(np.uint64), _PERM_A) + _PERM_B) % _MERSENNE_PRIME & _MAX_HASH
+    return hashed.min(axis=0).astype(np.uint32)
+
+
+def minhash_signature(content: str) -> np.ndarray:
+    return _signature(shingle_set(content))
+
+
+def jaccard(left: np.ndarray, right: np.ndarray) -> float:
+    """Exact Jaccard similarity of two shingle sets from shingle_set()."""
+    shared = len(np.intersect1d(left, right, assume_unique=True))
+    union = len(left) + len(right) - shared
+    return shared / union if union else 1.0
+
+
+def _lsh_shape(threshold: float, num_perm: int = NUM_PERMUTATIONS) -> Tuple[int, int]:
+    """
+    Picks (bands, rows) whose LSH S-curve midpoint (1/b)^(1/r) is the highest
+    one at or below the threshold, so pairs at the threshold are likely to
+    share a band (64 permutations at 0.85: 8 x 8, midpoint ~0.77). A midpoint
+    above the threshold would let most pairs near it through unchecked.
+    """
+    shapes = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    below = [(bands, rows) for bands, rows in shapes if (1 / bands) ** (1 / rows) <= threshold]
+    # Thresholds below every midpoint get the most permissive layout
+    return max(below, key=lambda s: (1 / s[0]) ** (1 / s[1])) if below else shapes[0]
+
+
+class MinHashDeduplicator:
+    """
+    Streaming near-duplicate filter. Each kept chunk's signature is indexed in
+    LSH bands; a new chunk is compared only against chunks that share a band,
+    and is dropped if their exact shingle Jaccard similarity reaches the
+    threshold (the 64-permutation estimate is too noisy to decide pairs near it).
+    """
+
+    def __init__(self, threshold: float = NEAR_DUP_THRESHOLD):
+        self.threshold = threshold
+        self.bands, self.rows = _lsh_shape(threshold)
+        self._buckets: List[Dict[bytes, List[int]]] = [defaultdict(list) for _ in range(self.bands)]
+        self._shingle_sets: List[np.ndarray] = []
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[b * self.rows: (b + 1) * self.rows].tobytes() for b in range(self.bands)]
+
+    def is_duplicate(self, content: str) -> bool:
+        """Checks the content and, if it is new, remembers it."""
+        shingles = shingle_set(content)
+        keys = self._band_keys(_signature(shingles))
+
+        candidates = set()
+        for band, key in enumerate(keys):
+            candidates.update(self._buckets[band].get(key, ()))
+        for candidate in candidates:
+            if jaccard(self._shingle_sets[candidate], shingles) >= self.threshold:
+                return True
+
+        index = len(self._shingle_sets)
+        self._shingle_sets.append(shingles)
+        for band, key in enumerate(keys):
+            self._buckets[band][key].append(index)
+        return False
+
+
+def drop_near_duplicates(
+        chunks: Iterable[Document],
+        stats: Dict[str, int],
+        threshold: float = NEAR_DUP_THRESHOLD,
+) -> Iterator[Document]:
+    """Filters repeated headers, footers and boilerplate slides out of a chunk stream."""
+    stats.setdefault("chunks_near_duplicate", 0)
+    if threshold <= 0:
+        yield from chunks
+        return
+
+    deduplicator = MinHashDeduplicator(threshold)
+    for chunk in chunks:
+        duplicate = deduplicator.is_duplicate(chunk.page_content)
+        _count(chunks_checked=1, chunks_dropped=int(duplicate))
+        if duplicate:
+            stats["chunks_near_duplicate"] += 1
+            continue
+        yield chunk
@@ -0,0 +1,163 @@
+import uuid
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import select, delete, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.pathway import EmbeddingStatus, Pathway
+from models.pathway_document import PathwayDocument
+from models.document_chunk import DocumentChunk
+from services.pdf_service import PdfFile, PdfSource
+
+
+async def register_documents(
+        db: AsyncSession,
+        pathway_id: uuid.UUID,
+        files: List[PdfFile],
+) -> Tuple[List[Tuple[str, PdfSource, PathwayDocument]], List[str]]:
+    """
+    Creates a PathwayDocument for every uploaded file that the pathway does not
+    already hold, keyed by the content hash computed while the upload was
+    spooled. Returns (files to ingest, skipped filenames).
+    A document whose earlier ingestion FAILED is reused and retried.
+    Changes are flushed, not committed.
+    """
+    result = await db.execute(select(PathwayDocument).where(PathwayDocument.pathway_id == pathway_id))
+    existing = {doc.file_hash: doc for doc in result.scalars().all()}
+
+    to_ingest, skipped = [], []
+    for filename, source, file_hash in files:
+        document = existing.get(file_hash)
+
+        if document and document.embedding_status != EmbeddingStatus.FAILED:
+            skipped.append(filename)
+            continue
+
+        if document:
+            document.filename = filename
+            document.embedding_status = EmbeddingStatus.PROCESSING
+        else:
+            document = PathwayDocument(
+                pathway_id=pathway_id,
+                filename=filename,
+                file_hash=file_hash,
+                embedding_status=EmbeddingStatus.PROCESSING,
+            )
+            db.add(document)
+            existing[file_hash] = document
+
+        to_ingest.append((filename, source, document))
+
+    await db.flush()
+    return to_ingest, skipped
+
+
+async def list_documents(db: AsyncSession, pathway_id: uuid.UUID) -> Sequence[PathwayDocument]:
+    result = await db.execute(
+        select(PathwayDocument)
+        .where(PathwayDocument.pathway_id == pathway_id)
+        .order_by(PathwayDocument.created)
+    )
+    return result.scalars().all()
+
+
+async def finalize_documents(
+        db: AsyncSession,
+        pathway_id: uuid.UUID,
+        document_ids: Sequence[uuid.UUID],
+        succeeded: bool,
+):
+    """
+    Marks the documents of a finished ingestion and records their stored chunk
+    counts; a document of a successful run that yielded no chunks is FAILED.
+    Ingestion commits batch by batch, so the rows a failed run already wrote
+    are deleted here.
+    """
+    if not document_ids:
+        return
+
+    if not succeeded:
+        await db.execute(
+            delete(DocumentChunk)
+            .where(DocumentChunk.pathway_id == pathway_id, DocumentChunk.document_id.in_(document_ids))
+        )
+
+    counts = {}
+    if succeeded:
+        rows = await db.execute(
+            select(DocumentChunk.document_id, func.count())
+            .where(DocumentChunk.pathway_id == pathway_id, DocumentChunk.document_id.in_(document_ids))
+            .group_by(DocumentChunk.document_id)
+        )
+        counts = {str(document_id): count for document_id, count in rows.all()}
+
+    result = await db.execute(select(PathwayDocument).where(PathwayDocument.id.in_(document_ids)))
+    for document in result.scalars().all():
+        document.chunk_count = counts.get(str(document.id), 0)
+        document.embedding_status = (
+            EmbeddingStatus.COMPLETED if succeeded and document.chunk_count else EmbeddingStatus.FAILED
+        )
+
+
+async def refresh_pathway_status(db: AsyncSession, pathway_id: uuid.UUID) -> Optional[EmbeddingStatus]:
+    """
+    Derives the pathway's embedding_status from its documents, so a failed
+    append never takes down material that is already searchable: COMPLETED
+    while any document (or chunk stored before documents were tracked) is
+    searchable, else PROCESSING while any is in flight, else FAILED.
+    A pathway without documents keeps its status. The caller commits.
+    """
+    pathway = await db.get(Pathway, pathway_id)
+    if not pathway:
+        return None
+
+    statuses = set((await db.execute(
+        select(PathwayDocument.embedding_status).where(PathwayDocument.pathway_id == pathway_id)
+    )).scalars().all())
+    if not statuses:
+        return pathway.embedding_status
+
+    untracked_chunks = (await db.execute(
+        select(DocumentChunk.id)
+        .where(DocumentChunk.pathway_id == pathway_id, DocumentChunk.document_id.is_(None))
+        .limit(1)
+    )).first()
+
+    if EmbeddingStatus.COMPLETED in statuses or untracked_chunks:
+        pathway.embedding_status = EmbeddingStatus.COMPLETED
+    elif EmbeddingStatus.PROCESSING in statuses:
+        pathway.embedding_status = EmbeddingStatus.PROCESSING
+    else:
+        pathway.embedding_status = EmbeddingStatus.FAILED
+    return pathway.embedding_status
+
+
+async def bump_collection_version(db: AsyncSession, pathway_id: uuid.UUID):
+    """Invalidates cached retrieval results for the pathway. The caller commits."""
+    await db.execute(
+        update(Pathway)
+        .where(Pathway.id == pathway_id)
+        .values(collection_version=Pathway.collection_version + 1)
+    )
+
+
+async def delete_document(db: AsyncSession, pathway_id: uuid.UUID, document_id: uuid.UUID) -> Optional[int]:
+    """
+    Removes one document's vectors from document_chunks and drops its record.
+    Returns the number of chunks deleted, or None if the document does not exist.
+    """
+    document = await db.get(PathwayDocument, document_id)
+    if not document or document.pathway_id != pathway_id:
+        return None
+
+    result = await db.execute(
+        delete(DocumentChunk)
+        .where(DocumentChunk.pathway_id == pathway_id, DocumentChunk.document_id == document_id)
+    )
+
+    await db.delete(document)
+    await db.flush()
+    await bump_collection_version(db, pathway_id)
+    await refresh_pathway_status(db, pathway_id)
+    await db.commit()
+    return result.rowcount
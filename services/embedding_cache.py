@@ -0,0 +1,121 @@
+import json
+import hashlib
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from langchain_core.embeddings import Embeddings
+
+from models.embedding_cache import EmbeddingCacheEntry
+from services.vector_store import get_engine, find_document_chunks
+
+
+# ---------------------------------------------------------
+# HIT / MISS COUNTERS
+# ---------------------------------------------------------
+
+_stats_lock = threading.Lock()
+_stats = {"chunk_hits": 0, "chunk_misses": 0, "document_hits": 0, "document_misses": 0}
+
+
+def _count(**deltas: int):
+    with _stats_lock:
+        for key, delta in deltas.items():
+            _stats[key] += delta
+
+
+def cache_stats() -> Dict[str, int]:
+    with _stats_lock:
+        return dict(_stats)
+
+
+# ---------------------------------------------------------
+# HASHING
+# ---------------------------------------------------------
+
+def normalize_text(content: str) -> str:
+    """Unicode-normalizes and collapses whitespace so trivially different copies share a key."""
+    return " ".join(unicodedata.normalize("NFKC", content).split())
+
+
+def chunk_key(model_name: str, content: str) -> str:
+    return hashlib.sha256(f"{model_name}\x00{normalize_text(content)}".encode("utf-8")).hexdigest()
+
+
+def _as_floats(vector) -> List[float]:
+    # Raw SQL returns pgvector values as '[0.1,0.2,...]' strings
+    if isinstance(vector, str):
+        return json.loads(vector)
+    return [float(v) for v in vector]
+
+
+# ---------------------------------------------------------
+# CHUNK-LEVEL CACHE
+# ---------------------------------------------------------
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embedding backend with the persistent `embedding_cache` table.
+    Only texts whose key is missing are sent to the backend; their vectors
+    are written back so the next upload of the same text is free.
+    Queries pass straight through.
+    """
+
+    def __init__(self, inner: Embeddings, model_name: str):
+        self.inner = inner
+        self.model_name = model_name
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [chunk_key(self.model_name, t) for t in texts]
+
+        with Session(get_engine()) as session:
+            rows = session.execute(
+                select(EmbeddingCacheEntry.content_hash, EmbeddingCacheEntry.embedding)
+                .where(EmbeddingCacheEntry.content_hash.in_(set(keys)))
+            ).all()
+        found = {key: _as_floats(vector) for key, vector in rows}
+
+        # Embed each distinct missing key once, even if it repeats within the batch
+        missing = {}
+        for key, content in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = content
+
+        if missing:
+            vectors = self.inner.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            found.update(fresh)
+            with Session(get_engine()) as session:
+                session.execute(
+                    insert(EmbeddingCacheEntry)
+                    .values([
+                        {"content_hash": key, "model": self.model_name, "embedding": vector}
+                        for key, vector in fresh.items()
+                    ])
+                    .on_conflict_do_nothing(index_elements=["content_hash"])
+                )
+                session.commit()
+
+        _count(chunk_hits=len(texts) - len(missing), chunk_misses=len(missing))
+        print(f"🗃️ TRACE: Embedding cache {len(texts) - len(missing)} hits / {len(missing)} misses.")
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.inner.embed_query(text)
+
+
+# ---------------------------------------------------------
+# DOCUMENT-LEVEL REUSE
+# ---------------------------------------------------------
+
+def find_document_embeddings(file_hash: str, model_name: str) -> Optional[List[Tuple[str, List[float], dict]]]:
+    """
+    Returns (text, vector, metadata) for every chunk of a file that was already
+    ingested with the same model, or None.
+    """
+    rows = find_document_chunks(file_hash, model_name)
+    _count(**({"document_hits": 1} if rows else {"document_misses": 1}))
+    return rows
@@ -0,0 +1,205 @@
+import os
+import time
+import random
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional, TypeVar
+
+from langchain_core.embeddings import Embeddings
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# ---------------- CONFIG ----------------
+
+# Texts per second sent to the embedding provider, shared by every job in the process
+EMBED_RATE_LIMIT = float(os.getenv("EMBED_RATE_LIMIT", "100"))
+EMBED_BURST = float(os.getenv("EMBED_BURST", str(EMBED_RATE_LIMIT * 2)))
+EMBED_MIN_RATE = float(os.getenv("EMBED_MIN_RATE", "5"))
+# Batches being embedded/stored at the same time, across all jobs
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+
+
+# Per-job counters (e.g. an ingestion job's progress stats) that retries are
+# attributed to. Propagated into executor threads by run_in_order.
+current_job_stats: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("current_job_stats", default=None)
+
+
+class RateLimitedError(Exception):
+    """Raised when the provider keeps answering 429 after all retries."""
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) == 429 or getattr(error, "status_code", None) == 429:
+        return True
+    message = str(error).lower()
+    return "429" in message or "too many requests" in message or "rate limit" in message
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+# ---------------------------------------------------------
+# TOKEN BUCKET
+# ---------------------------------------------------------
+
+class TokenBucket:
+    """Thread-safe token bucket whose refill rate can be changed while running."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, cost: float = 1.0):
+        # A single request larger than the bucket is allowed once the bucket is full
+        cost = min(cost, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= cost:
+                    self._tokens -= cost
+                    return
+                wait = max(self._paused_until - now, (cost - self._tokens) / self.rate)
+            time.sleep(min(wait, 1.0))
+
+    def pause(self, seconds: float):
+        """Stops every caller for `seconds`, e.g. after the provider sent a 429."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+    def set_rate(self, rate: float):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+
+# ---------------------------------------------------------
+# SCHEDULER
+# ---------------------------------------------------------
+
+class EmbeddingScheduler:
+    """
+    Process-wide gate in front of the embedding provider.
+
+    Every provider call takes tokens from one shared bucket. A 429 halves the
+    rate and pauses all callers with jittered exponential backoff; each success
+    creeps the rate back up towards the configured ceiling (AIMD), so idle
+    periods run at full quota and bursts from concurrent uploads back off together.
+    """
+
+    def __init__(self, rate: float, burst: float, min_rate: float, max_in_flight: int, max_retries: int):
+        self.max_rate = rate
+        self.min_rate = min_rate
+        self.max_retries = max_retries
+        self.bucket = TokenBucket(rate, burst)
+        self.max_in_flight = max_in_flight
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="embed")
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "rate_limited": 0, "retries": 0}
+
+    def _on_success(self):
+        with self._lock:
+            self.stats["calls"] += 1
+            rate = self.bucket.rate
+        if rate < self.max_rate:
+            self.bucket.set_rate(min(self.max_rate, rate + self.max_rate * 0.05))
+
+    def _on_rate_limited(self, attempt: int, error: Exception) -> float:
+        with self._lock:
+            self.stats["rate_limited"] += 1
+            self.stats["retries"] += 1
+            job_stats = current_job_stats.get()
+            if job_stats is not None:
+                job_stats["batches_retried"] = job_stats.get("batches_retried", 0) + 1
+            rate = self.bucket.rate
+        self.bucket.set_rate(max(self.min_rate, rate / 2))
+        delay = _retry_after(error) or min(60.0, (2 ** attempt) + random.uniform(0, 1))
+        self.bucket.pause(delay)
+        return delay
+
+    def call(self, fn: Callable[[], R], cost: float = 1.0) -> R:
+        """Runs one provider call under the shared limit, retrying on 429."""
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire(cost)
+            try:
+                result = fn()
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                if attempt == self.max_retries:
+                    raise RateLimitedError(f"Embedding provider still rate limited after {attempt} retries") from e
+                delay = self._on_rate_limited(attempt, e)
+                print(f"⏳ TRACE: Embedding provider returned 429, backing off {delay:.1f}s "
+                      f"(rate now {self.bucket.rate:.0f}/s).")
+                continue
+            self._on_success()
+            return result
+
+    def run_in_order(self, fn: Callable[[T], R], items: Iterable[T]) -> Iterator[R]:
+        """
+        Runs `fn` over `items` on the shared executor with several calls in flight,
+        yielding results in input order. Pulls at most max_in_flight items ahead.
+        The caller's context variables are visible inside each call.
+        """
+        pending = deque()
+        try:
+            for item in items:
+                pending.append(self.executor.submit(contextvars.copy_context().run, fn, item))
+                if len(pending) >= self.max_in_flight:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+_scheduler: Optional[EmbeddingScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_embedding_scheduler() -> EmbeddingScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = EmbeddingScheduler(
+                rate=EMBED_RATE_LIMIT,
+                burst=EMBED_BURST,
+                min_rate=EMBED_MIN_RATE,
+                max_in_flight=EMBED_MAX_IN_FLIGHT,
+                max_retries=EMBED_MAX_RETRIES,
+            )
+        return _scheduler
+
+
+class RateLimitedEmbeddings(Embeddings):
+    """Routes an embedding backend through the shared scheduler (cost = number of texts)."""
+
+    def __init__(self, inner: Embeddings, scheduler: Optional[EmbeddingScheduler] = None):
+        self.inner = inner
+        self.scheduler = scheduler or get_embedding_scheduler()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.scheduler.call(lambda: self.inner.embed_documents(texts), cost=len(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.scheduler.call(lambda: self.inner.embed_query(text), cost=1)
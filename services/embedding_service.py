@@ -0,0 +1,274 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+from langchain_huggingface import HuggingFaceEndpointEmbeddings
+
+load_dotenv()
+
+# ---------------- CONFIG ----------------
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_DIMENSIONS = 384
+
+# "remote": HuggingFace inference endpoint (network round trip per call)
+# "local":  in-process ONNX Runtime on CPU (needs onnxruntime + tokenizers)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "remote").lower()
+LOCAL_EMBED_BATCH_SIZE = int(os.getenv("LOCAL_EMBED_BATCH_SIZE", "32"))
+LOCAL_EMBED_THREADS = int(os.getenv("LOCAL_EMBED_THREADS", "0"))  # 0 = onnxruntime default
+LOCAL_MAX_SEQ_LENGTH = 256  # all-MiniLM-L6-v2 was trained with 256 word pieces
+
+# In-process cache for ad-hoc query vectors (chat questions, search strings)
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "3600"))
+
+
+# ---------------------------------------------------------
+# LOCAL CPU BACKEND
+# ---------------------------------------------------------
+
+class LocalOnnxEmbeddings(Embeddings):
+    """
+    all-MiniLM-L6-v2 run in-process with ONNX Runtime: tokenizes a batch,
+    runs the transformer, mean-pools over the attention mask and L2-normalizes,
+    matching the sentence-transformers pipeline so vectors stay compatible
+    with chunks embedded by the remote endpoint.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, batch_size: int = LOCAL_EMBED_BATCH_SIZE):
+        try:
+            import numpy as np
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+            from huggingface_hub import hf_hub_download
+        except ImportError as e:
+            raise ImportError(
+                "EMBEDDING_BACKEND=local needs numpy, onnxruntime and tokenizers installed"
+            ) from e
+
+        self._np = np
+        self.model_name = model_name
+        self.batch_size = batch_size
+
+        token = os.getenv("HF_TOKEN")
+        model_path = hf_hub_download(model_name, "onnx/model.onnx", token=token)
+        tokenizer_path = hf_hub_download(model_name, "tokenizer.json", token=token)
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=LOCAL_MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        if LOCAL_EMBED_THREADS:
+            options.intra_op_num_threads = LOCAL_EMBED_THREADS
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        np = self._np
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self.session.run(None, inputs)[0]
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            vectors.extend(self._embed_batch(texts[i: i + self.batch_size]))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_batch([text])[0]
+
+
+# ---------------------------------------------------------
+# LATENCY REPORTING
+# ---------------------------------------------------------
+
+class TimedEmbeddings(Embeddings):
+    """Records per-call latency of whichever backend is configured."""
+
+    def __init__(self, inner: Embeddings, backend: str):
+        self.inner = inner
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._stats = {"batches": 0, "texts": 0, "total_ms": 0.0, "last_ms": 0.0, "queries": 0, "query_ms": 0.0}
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        started = time.perf_counter()
+        vectors = self.inner.embed_documents(texts)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["texts"] += len(texts)
+            self._stats["total_ms"] += elapsed_ms
+            self._stats["last_ms"] = elapsed_ms
+        print(f"⏱️ TRACE: [{self.backend}] embedded batch of {len(texts)} in {elapsed_ms:.0f} ms.")
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        started = time.perf_counter()
+        vector = self.inner.embed_query(text)
+        with self._lock:
+            self._stats["queries"] += 1
+            self._stats["query_ms"] += (time.perf_counter() - started) * 1000
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        started = time.perf_counter()
+        vector = await self.inner.aembed_query(text)
+        with self._lock:
+            self._stats["queries"] += 1
+            self._stats["query_ms"] += (time.perf_counter() - started) * 1000
+        return vector
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["backend"] = self.backend
+        stats["avg_batch_ms"] = stats["total_ms"] / stats["batches"] if stats["batches"] else 0.0
+        stats["avg_query_ms"] = stats["query_ms"] / stats["queries"] if stats["queries"] else 0.0
+        return stats
+
+
+# ---------------------------------------------------------
+# QUERY CACHE
+# ---------------------------------------------------------
+
+class QueryCachedEmbeddings(Embeddings):
+    """
+    LRU cache with a TTL in front of embed_query. Chat users repeat questions
+    and retrieval strings often; a hit skips the provider round trip entirely.
+    Keys ignore case and whitespace differences. Document embedding passes through.
+    """
+
+    def __init__(self, inner: Embeddings, max_size: int = QUERY_CACHE_SIZE, ttl: float = QUERY_CACHE_TTL_SECONDS):
+        self.inner = inner
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return " ".join(text.lower().split())
+
+    def _get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, vector = entry
+                if time.monotonic() - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return vector
+                del self._entries[key]
+                self._stats["expired"] += 1
+            self._stats["misses"] += 1
+            return None
+
+    def _put(self, key: str, vector: List[float]):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats["evicted"] += 1
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.inner.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.inner.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vector = self._get(key)
+        if vector is None:
+            vector = self.inner.embed_query(text)
+            self._put(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vector = self._get(key)
+        if vector is None:
+            vector = await self.inner.aembed_query(text)
+            self._put(key, vector)
+        return vector
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+# ---------------------------------------------------------
+# PROVIDER SELECTION
+# ---------------------------------------------------------
+
+_embedding_function: Optional[TimedEmbeddings] = None
+_query_embedding_function: Optional[QueryCachedEmbeddings] = None
+_embedding_lock = threading.Lock()
+
+
+def _build_backend(backend: str) -> Embeddings:
+    if backend == "local":
+        return LocalOnnxEmbeddings()
+    if backend == "remote":
+        return HuggingFaceEndpointEmbeddings(
+            model=EMBEDDING_MODEL,
+            huggingfacehub_api_token=os.getenv("HF_TOKEN")
+        )
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}' (expected 'remote' or 'local')")
+
+
+def get_embedding_function() -> TimedEmbeddings:
+    """The process-wide embedding provider shared by ingestion, chat, summaries and quizzes."""
+    global _embedding_function
+    with _embedding_lock:
+        if _embedding_function is None:
+            _embedding_function = TimedEmbeddings(_build_backend(EMBEDDING_BACKEND), EMBEDDING_BACKEND)
+            print(f"🧠 TRACE: Embedding backend '{EMBEDDING_BACKEND}' ready.")
+        return _embedding_function
+
+
+def get_query_embedding_function() -> QueryCachedEmbeddings:
+    """The shared provider behind the query-vector cache; use it for retrieval."""
+    global _query_embedding_function
+    provider = get_embedding_function()
+    with _embedding_lock:
+        if _query_embedding_function is None:
+            _query_embedding_function = QueryCachedEmbeddings(provider)
+        return _query_embedding_function
+
+
+def embedding_stats() -> Dict[str, Dict[str, float]]:
+    """Stats of the shared embedding functions built so far; never builds one."""
+    stats = {}
+    if _embedding_function is not None:
+        stats["provider"] = _embedding_function.stats()
+    if _query_embedding_function is not None:
+        stats["query_cache"] = _query_embedding_function.stats()
+    return stats
+
+
+def is_remote_backend() -> bool:
+    return EMBEDDING_BACKEND == "remote"
@@ -0,0 +1,239 @@
+import os
+import re
+import json
+import uuid
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from langchain_core.documents import Document
+
+# ---------------- CONFIG ----------------
+
+# Optional: serve vector retrieval for active pathways from process memory
+HOT_INDEX_ENABLED = os.getenv("HOT_INDEX_ENABLED", "false").lower() == "true"
+HOT_INDEX_MEMORY_BYTES = int(float(os.getenv("HOT_INDEX_MEMORY_MB", "256")) * 1024 * 1024)
+HOT_INDEX_DIR = os.getenv("HOT_INDEX_DIR", os.path.join(os.getcwd(), ".hot_index"))
+HOT_INDEX_BLOCK_ROWS = int(os.getenv("HOT_INDEX_BLOCK_ROWS", "65536"))
+
+
+class PathwayIndex:
+    """
+    One pathway's chunks as a contiguous float32 matrix of unit vectors plus the
+    matching texts and document_chunks ids. Cosine top-k is a matrix-vector
+    product; pathways larger than one block are scored block by block so the
+    temporary score array stays small.
+    """
+
+    def __init__(self, matrix: np.ndarray, contents: List[str], metadatas: List[dict], ids: List[int]):
+        self.matrix = matrix
+        self.contents = contents
+        self.metadatas = metadatas
+        self.ids = ids
+        self.row_of_id = {chunk_id: row for row, chunk_id in enumerate(ids)}
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes
+
+    @staticmethod
+    def _unit(vector: Sequence[float]) -> np.ndarray:
+        query = np.array(vector, dtype=np.float32)
+        return query / max(np.linalg.norm(query), 1e-12)
+
+    def document(self, row: int) -> Document:
+        return Document(page_content=self.contents[row], metadata=dict(self.metadatas[row]))
+
+    def distances(self, vector: Sequence[float], rows: Sequence[int]) -> List[float]:
+        """Cosine distances from the query to the given rows."""
+        if not len(rows):
+            return []
+        return [float(1 - score) for score in self.matrix[np.asarray(rows)] @ self._unit(vector)]
+
+    def nearest_rows(self, vector: Sequence[float], k: int) -> List[Tuple[int, float]]:
+        """(row, cosine distance) of the k nearest chunks, closest first."""
+        if not len(self.contents):
+            return []
+        query = self._unit(vector)
+
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for start in range(0, self.matrix.shape[0], HOT_INDEX_BLOCK_ROWS):
+            scores = self.matrix[start: start + HOT_INDEX_BLOCK_ROWS] @ query
+            top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+            best_rows = np.concatenate([best_rows, top + start])
+            best_scores = np.concatenate([best_scores, scores[top]])
+            if len(best_rows) > k:
+                keep = np.argpartition(-best_scores, k - 1)[:k]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+
+        order = np.argsort(-best_scores)
+        # Same convention as the SQL path: cosine distance, lower is closer
+        return [(int(row), float(1 - score)) for row, score in zip(best_rows[order], best_scores[order])]
+
+    def search(self, vector: Sequence[float], k: int) -> List[Tuple[Document, float]]:
+        return [(self.document(row), distance) for row, distance in self.nearest_rows(vector, k)]
+
+
+# ---------------------------------------------------------
+# SNAPSHOTS
+# ---------------------------------------------------------
+
+def _snapshot_paths(pathway_id: uuid.UUID, version: int) -> Tuple[str, str]:
+    stem = os.path.join(HOT_INDEX_DIR, f"{pathway_id}_v{version}")
+    return stem + ".npy", stem + ".json"
+
+
+def _load_snapshot(pathway_id: uuid.UUID, version: int) -> Optional[PathwayIndex]:
+    matrix_path, texts_path = _snapshot_paths(pathway_id, version)
+    if not (os.path.exists(matrix_path) and os.path.exists(texts_path)):
+        return None
+    with open(texts_path, encoding="utf-8") as f:
+        texts = json.load(f)
+    if "ids" not in texts:
+        # Written before chunk ids were kept; rebuilt from the database
+        return None
+    # Mapped, not read: pages are faulted in by the first searches
+    matrix = np.load(matrix_path, mmap_mode="r")
+    return PathwayIndex(matrix, texts["contents"], texts["metadatas"], texts["ids"])
+
+
+def _save_snapshot(pathway_id: uuid.UUID, version: int, index: PathwayIndex):
+    os.makedirs(HOT_INDEX_DIR, exist_ok=True)
+    matrix_path, texts_path = _snapshot_paths(pathway_id, version)
+    # Write-then-rename so a concurrent worker never maps a partial file
+    np.save(matrix_path + ".tmp.npy", index.matrix)
+    os.replace(matrix_path + ".tmp.npy", matrix_path)
+    with open(texts_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"contents": index.contents, "metadatas": index.metadatas, "ids": index.ids}, f)
+    os.replace(texts_path + ".tmp", texts_path)
+
+    # Snapshots of older collection versions can never be used again; newer
+    # ones (written by a worker that already saw a re-ingest) are kept
+    pattern = re.compile(rf"^{re.escape(str(pathway_id))}_v(\d+)\.")
+    for name in os.listdir(HOT_INDEX_DIR):
+        match = pattern.match(name)
+        if match and int(match.group(1)) < version:
+            try:
+                os.remove(os.path.join(HOT_INDEX_DIR, name))
+            except OSError:
+                pass
+
+
+def _build_index(rows) -> PathwayIndex:
+    ids, contents, metadatas, vectors = [], [], [], []
+    for chunk_id, content, metadata, source, page, embedding in rows:
+        metadata = dict(json.loads(metadata) if isinstance(metadata, str) else metadata or {})
+        metadata.setdefault("source", source)
+        metadata.setdefault("page", page)
+        ids.append(chunk_id)
+        contents.append(content)
+        metadatas.append(metadata)
+        vectors.append(np.array(embedding.strip("[]").split(","), dtype=np.float32))
+
+    matrix = np.vstack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+    if len(vectors):
+        matrix /= np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+    return PathwayIndex(np.ascontiguousarray(matrix), contents, metadatas, ids)
+
+
+# ---------------------------------------------------------
+# LRU UNDER A MEMORY BUDGET
+# ---------------------------------------------------------
+
+class HotIndexRegistry:
+    """
+    Keeps the most recently queried pathways in memory, evicting the least
+    recently used once HOT_INDEX_MEMORY_MB is exceeded. Indexes are keyed by
+    collection version, so a pathway that was re-ingested is rebuilt rather
+    than served stale. A pathway that alone exceeds the budget is not kept.
+    """
+
+    def __init__(self, budget_bytes: int = HOT_INDEX_MEMORY_BYTES):
+        self.budget_bytes = budget_bytes
+        self._indexes: "OrderedDict[uuid.UUID, Tuple[int, PathwayIndex]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # pathway -> [lock, callers using it]; dropped once the last caller is done
+        self._load_locks: Dict[uuid.UUID, list] = {}
+        self._stats = {"hits": 0, "loads_db": 0, "loads_snapshot": 0, "evicted": 0}
+
+    def _lookup(self, pathway_id: uuid.UUID, version: int) -> Optional[PathwayIndex]:
+        with self._lock:
+            entry = self._indexes.get(pathway_id)
+            if entry and entry[0] == version:
+                self._indexes.move_to_end(pathway_id)
+                self._stats["hits"] += 1
+                return entry[1]
+            return None
+
+    def _admit(self, pathway_id: uuid.UUID, version: int, index: PathwayIndex):
+        if index.nbytes > self.budget_bytes:
+            return
+        with self._lock:
+            self._indexes[pathway_id] = (version, index)
+            self._indexes.move_to_end(pathway_id)
+            while sum(i.nbytes for _, i in self._indexes.values()) > self.budget_bytes:
+                self._indexes.popitem(last=False)
+                self._stats["evicted"] += 1
+
+    async def get(self, pathway_id: uuid.UUID, version: int) -> PathwayIndex:
+        index = self._lookup(pathway_id, version)
+        if index is not None:
+            return index
+
+        # One loader per pathway; concurrent queries wait for it instead of piling on the DB
+        entry = self._load_locks.setdefault(pathway_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                index = self._lookup(pathway_id, version)
+                if index is not None:
+                    return index
+
+                index = await asyncio.to_thread(_load_snapshot, pathway_id, version)
+                if index is not None:
+                    self._stats["loads_snapshot"] += 1
+                else:
+                    index = await self._load_from_db(pathway_id, version)
+                    self._stats["loads_db"] += 1
+                self._admit(pathway_id, version, index)
+                return index
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._load_locks[pathway_id]
+
+    async def _load_from_db(self, pathway_id: uuid.UUID, version: int) -> PathwayIndex:
+        from core.db import engine as async_engine
+
+        async with async_engine.connect() as conn:
+            rows = (await conn.execute(text("""
+                SELECT id, content, cmetadata, source, page, embedding::text
+                FROM document_chunks
+                WHERE pathway_id = :pathway_id AND embedding IS NOT NULL
+                ORDER BY id
+            """), {"pathway_id": pathway_id})).all()
+
+        def build_and_save():
+            index = _build_index(rows)
+            try:
+                _save_snapshot(pathway_id, version, index)
+            except OSError as e:
+                print(f"⚠️ Hot index snapshot not saved for {pathway_id}: {e}")
+            return index
+
+        return await asyncio.to_thread(build_and_save)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pathways"] = len(self._indexes)
+            stats["bytes"] = sum(i.nbytes for _, i in self._indexes.values())
+        stats["budget_bytes"] = self.budget_bytes
+        return stats
+
+
+hot_indexes = HotIndexRegistry()
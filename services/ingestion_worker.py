@@ -0,0 +1,279 @@
+import io
+import os
+import uuid
+import socket
+import asyncio
+import tempfile
+import traceback
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select, or_, and_, update, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.db import get_session_context
+from models.ingestion_job import IngestionJob, IngestionJobFile, JobStatus
+from services.rag_service import process_and_embed_pdfs
+from services.document_service import finalize_documents, bump_collection_version, refresh_pathway_status
+from services.pdf_service import PdfSource
+from services.progress_service import publish_progress
+from services.topic_embedding_service import prepare_pathway_context
+
+# ---------------- CONFIG ----------------
+
+# A RUNNING job whose heartbeat is older than this is assumed dead and reclaimed
+JOB_LEASE_SECONDS = int(os.getenv("INGESTION_JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("INGESTION_JOB_MAX_ATTEMPTS", "3"))
+POLL_INTERVAL_SECONDS = float(os.getenv("INGESTION_POLL_INTERVAL", "2"))
+# Block size for streaming uploads into and out of their large objects
+TRANSFER_BLOCK_BYTES = 1024 * 1024
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+# ---------------------------------------------------------
+# ENQUEUE (API SIDE)
+# ---------------------------------------------------------
+
+async def enqueue_ingestion_job(
+        db: AsyncSession,
+        pathway_id: uuid.UUID,
+        file_contents: List[Tuple[str, PdfSource, Optional[uuid.UUID]]],
+) -> IngestionJob:
+    """
+    Persists the uploaded files and a QUEUED job in one transaction.
+    Each file is streamed into a Postgres large object in blocks, so the
+    request never holds more than one block of an upload in memory.
+    """
+    job = IngestionJob(pathway_id=pathway_id, status=JobStatus.QUEUED)
+    db.add(job)
+    await db.flush()
+
+    for position, (filename, source, document_id) in enumerate(file_contents):
+        db.add(IngestionJobFile(
+            job_id=job.id,
+            position=position,
+            filename=filename,
+            content_oid=await _store_large_object(db, source),
+            document_id=document_id,
+        ))
+
+    await db.commit()
+    return job
+
+
+async def _store_large_object(db: AsyncSession, source: PdfSource) -> int:
+    oid = (await db.execute(text("SELECT lo_create(0)"))).scalar_one()
+    if isinstance(source, str):
+        stream = open(source, "rb")
+    elif isinstance(source, (bytes, bytearray)):
+        stream = io.BytesIO(source)
+    else:
+        stream = source
+        stream.seek(0)
+    try:
+        offset = 0
+        while True:
+            block = await asyncio.to_thread(stream.read, TRANSFER_BLOCK_BYTES)
+            if not block:
+                break
+            await db.execute(
+                text("SELECT lo_put(:oid, :offset, :block)"),
+                {"oid": oid, "offset": offset, "block": block},
+            )
+            offset += len(block)
+    finally:
+        if isinstance(source, str):
+            stream.close()
+    return oid
+
+
+# ---------------------------------------------------------
+# CLAIM / CHECKPOINT (WORKER SIDE)
+# ---------------------------------------------------------
+
+async def claim_next_job(db: AsyncSession) -> Optional[IngestionJob]:
+    """
+    Claims the oldest runnable job with SELECT ... FOR UPDATE SKIP LOCKED, so any
+    number of workers can poll the same table without handing out a job twice.
+    Runnable means QUEUED, or RUNNING with an expired lease (its worker died).
+    """
+    lease_cutoff = datetime.now() - timedelta(seconds=JOB_LEASE_SECONDS)
+    query = (
+        select(IngestionJob)
+        .where(or_(
+            IngestionJob.status == JobStatus.QUEUED,
+            and_(IngestionJob.status == JobStatus.RUNNING, IngestionJob.heartbeat_at < lease_cutoff),
+        ))
+        .order_by(IngestionJob.created)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    job = (await db.execute(query)).scalar_one_or_none()
+    if not job:
+        await db.rollback()
+        return None
+
+    job.status = JobStatus.RUNNING
+    job.attempts += 1
+    # batches_done / chunks_stored are kept: a reclaimed job resumes after the
+    # chunks its earlier attempt committed
+    job.locked_by = WORKER_ID
+    job.heartbeat_at = datetime.now()
+    await db.commit()
+    return job
+
+
+async def _checkpoint(job_id: uuid.UUID, batch_number: int, chunk_count: int):
+    async with get_session_context() as db:
+        await db.execute(
+            update(IngestionJob)
+            .where(IngestionJob.id == job_id, IngestionJob.locked_by == WORKER_ID)
+            .values(
+                batches_done=batch_number,
+                chunks_stored=IngestionJob.chunks_stored + chunk_count,
+                heartbeat_at=datetime.now(),
+            )
+        )
+        await db.commit()
+
+
+async def _finish(job_id: uuid.UUID, status: JobStatus, error: Optional[str] = None):
+    async with get_session_context() as db:
+        job = await db.get(IngestionJob, job_id)
+        if not job:
+            return
+        job.status = status
+        job.error = error
+        job.locked_by = None
+        if status == JobStatus.FAILED:
+            document_ids = (await db.execute(
+                select(IngestionJobFile.document_id)
+                .where(IngestionJobFile.job_id == job_id, IngestionJobFile.document_id.is_not(None))
+            )).scalars().all()
+            await finalize_documents(db, job.pathway_id, document_ids, succeeded=False)
+            await bump_collection_version(db, job.pathway_id)
+            await refresh_pathway_status(db, job.pathway_id)
+        # The PDFs are not needed once the job is over: a failed document is
+        # retried by uploading it again
+        await db.execute(IngestionJobFile.__table__.delete().where(IngestionJobFile.job_id == job_id))
+        await db.commit()
+
+
+async def _stage_job_file(content_oid: int) -> str:
+    """Copies one stored upload to a local temp file block by block and returns its path."""
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        try:
+            async with get_session_context() as db:
+                offset = 0
+                while True:
+                    block = (await db.execute(
+                        text("SELECT lo_get(:oid, :offset, :length)"),
+                        {"oid": content_oid, "offset": offset, "length": TRANSFER_BLOCK_BYTES},
+                    )).scalar_one()
+                    if not block:
+                        break
+                    await asyncio.to_thread(f.write, block)
+                    offset += len(block)
+        except BaseException:
+            f.close()
+            os.remove(f.name)
+            raise
+        return f.name
+
+
+async def run_job(job: IngestionJob):
+    if job.attempts > JOB_MAX_ATTEMPTS:
+        print(f"🚨 TRACE: Job {job.id} exceeded {JOB_MAX_ATTEMPTS} attempts, giving up.")
+        await _finish(job.id, JobStatus.FAILED, "Exceeded maximum attempts")
+        await publish_progress(job.id, job.pathway_id, {"status": "FAILED"})
+        return
+
+    async with get_session_context() as db:
+        result = await db.execute(
+            select(IngestionJobFile.content_oid, IngestionJobFile.filename, IngestionJobFile.document_id)
+            .where(IngestionJobFile.job_id == job.id)
+            .order_by(IngestionJobFile.position)
+        )
+        job_files = result.all()
+
+    if job.attempts > 1:
+        print(f"🔁 TRACE: Resuming job {job.id} (attempt {job.attempts}) after batch {job.batches_done}.")
+
+    async def on_batch(batch_number: int, chunk_count: int):
+        await _checkpoint(job.id, batch_number, chunk_count)
+
+    async def on_progress(snapshot: dict):
+        await publish_progress(job.id, job.pathway_id, snapshot)
+
+    paths = []
+    try:
+        # One file's bytes in memory at a time; the pipeline reads the staged copies
+        for content_oid, _, _ in job_files:
+            paths.append(await _stage_job_file(content_oid))
+        files = [(filename, path, document_id) for (_, filename, document_id), path in zip(job_files, paths)]
+
+        ok = await process_and_embed_pdfs(
+            job.pathway_id,
+            files,
+            on_batch=on_batch,
+            on_progress=on_progress,
+            batch_offset=job.batches_done,
+        )
+    finally:
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    await _finish(job.id, JobStatus.COMPLETED if ok else JobStatus.FAILED,
+                  None if ok else "Ingestion failed, see worker logs")
+    if ok:
+        # Once per job: stores the topics' query vectors (and, with HOT_INDEX_ENABLED, writes the snapshot)
+        try:
+            await prepare_pathway_context(job.pathway_id)
+        except Exception as e:
+            print(f"⚠️ Could not prepare context for pathway {job.pathway_id}: {e}")
+
+
+async def _heartbeat(job_id: uuid.UUID):
+    """Keeps the lease alive during long stretches without a finished batch (e.g. parsing)."""
+    while True:
+        await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+        async with get_session_context() as db:
+            await db.execute(
+                update(IngestionJob)
+                .where(IngestionJob.id == job_id, IngestionJob.locked_by == WORKER_ID)
+                .values(heartbeat_at=datetime.now())
+            )
+            await db.commit()
+
+
+async def run_worker_loop(stop: Optional[asyncio.Event] = None):
+    print(f"👷 TRACE: Ingestion worker {WORKER_ID} started.")
+    stop = stop or asyncio.Event()
+    while not stop.is_set():
+        try:
+            async with get_session_context() as db:
+                job = await claim_next_job(db)
+        except Exception as e:
+            print(f"🚨 Worker claim error: {e}")
+            job = None
+
+        if not job:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        print(f"📥 TRACE: Claimed job {job.id} (attempt {job.attempts}).")
+        heartbeat = asyncio.create_task(_heartbeat(job.id))
+        try:
+            await run_job(job)
+        except Exception as e:
+            # Leave the job RUNNING; its lease expires and another worker retries it
+            print(f"🚨 Worker job error: {e}")
+            traceback.print_exc()
+        finally:
+            heartbeat.cancel()
@@ -0,0 +1,227 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Dict, Optional
+
+from dotenv import load_dotenv
+from langchain_core.runnables import Runnable
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from services.embedding_scheduler import is_rate_limit_error
+
+load_dotenv()
+
+# ---------------- CONFIG ----------------
+
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.5-flash")
+# Gemini calls in flight at once, across every service in the process
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "20"))
+# Whole call for invoke; the wait for each next chunk when streaming
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+
+
+class LLMUnavailableError(Exception):
+    """
+    Raised when Gemini is still out of quota after all retries, or a call times
+    out; `status_code` is the HTTP status to return.
+    """
+
+    def __init__(self, message: str, retry_after: Optional[float] = None, status_code: int = 503):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+    @property
+    def headers(self) -> Optional[Dict[str, str]]:
+        return {"Retry-After": str(max(1, round(self.retry_after)))} if self.retry_after else None
+
+
+def is_quota_error(error: Exception) -> bool:
+    # google.api_core raises ResourceExhausted; the google-genai client a ClientError with code 429
+    if type(error).__name__ == "ResourceExhausted" or getattr(error, "code", None) == 429:
+        return True
+    message = str(error).lower()
+    return is_rate_limit_error(error) or "resource exhausted" in message or "resource_exhausted" in message
+
+
+# ---------------------------------------------------------
+# SHARED CLIENT
+# ---------------------------------------------------------
+
+_chat_model: Optional[ChatGoogleGenerativeAI] = None
+_chat_model_lock = threading.Lock()
+
+
+def get_chat_model(json_output: bool = False) -> Runnable:
+    """
+    The process-wide Gemini chat model, so every service shares one client
+    and its connections. The client's own retries are off; LLMGateway retries.
+    """
+    global _chat_model
+    with _chat_model_lock:
+        if _chat_model is None:
+            _chat_model = ChatGoogleGenerativeAI(
+                model=LLM_MODEL,
+                google_api_key=os.getenv("API_KEY"),
+                max_retries=0,
+                timeout=LLM_TIMEOUT_SECONDS,
+            )
+    if json_output:
+        return _chat_model.bind(generation_config={"response_mime_type": "application/json"})
+    return _chat_model
+
+
+# ---------------------------------------------------------
+# GATEWAY
+# ---------------------------------------------------------
+
+class LLMGateway:
+    """
+    Process-wide gate in front of Gemini.
+
+    Every call takes a slot of one semaphore, so bursts from chat, summaries,
+    quizzes and pathway generation queue here instead of at the provider.
+    Quota errors are retried with jittered exponential backoff; the slot is
+    released while backing off. A call that exceeds its timeout is not
+    retried. Both end in LLMUnavailableError, which routes answer with 503.
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, max_retries: int = LLM_MAX_RETRIES,
+                 timeout: float = LLM_TIMEOUT_SECONDS):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._stats = {"calls": 0, "errors": 0, "quota_errors": 0, "retries": 0, "timeouts": 0,
+                       "queued_ms": 0, "total_ms": 0}
+        self._operations: Dict[str, Dict[str, int]] = {}
+
+    def _record(self, operation: str, started_at: float, error: bool = False):
+        elapsed_ms = round((time.monotonic() - started_at) * 1000)
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["errors"] += int(error)
+            self._stats["total_ms"] += elapsed_ms
+            op = self._operations.setdefault(operation, {"calls": 0, "errors": 0, "total_ms": 0})
+            op["calls"] += 1
+            op["errors"] += int(error)
+            op["total_ms"] += elapsed_ms
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self._stats[key] += amount
+
+    async def _acquire(self):
+        queued_at = time.monotonic()
+        await self._semaphore.acquire()
+        with self._lock:
+            self._in_flight += 1
+            self._stats["queued_ms"] += round((time.monotonic() - queued_at) * 1000)
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._semaphore.release()
+
+    async def _backoff(self, operation: str, attempt: int, error: Exception):
+        """Sleeps before the next attempt, or raises once the retries are spent."""
+        self._count("quota_errors")
+        delay = min(LLM_BACKOFF_MAX_SECONDS, 2 ** attempt) + random.uniform(0, 1)
+        if attempt == self.max_retries:
+            raise LLMUnavailableError(
+                f"LLM quota exhausted after {attempt} retries", retry_after=delay
+            ) from error
+        self._count("retries")
+        print(f"⏳ TRACE: LLM quota error during {operation}, backing off {delay:.1f}s.")
+        await asyncio.sleep(delay)
+
+    async def ainvoke(self, runnable: Runnable, inputs: Any, operation: str = "invoke",
+                      timeout: Optional[float] = None) -> Any:
+        """Runs `runnable.ainvoke(inputs)` under the shared limit, retrying quota errors."""
+        timeout = timeout or self.timeout
+        started_at = time.monotonic()
+        for attempt in range(self.max_retries + 1):
+            await self._acquire()
+            try:
+                result = await asyncio.wait_for(runnable.ainvoke(inputs), timeout)
+            except asyncio.TimeoutError as e:
+                self._count("timeouts")
+                self._record(operation, started_at, error=True)
+                raise LLMUnavailableError(f"LLM call timed out after {timeout:.0f}s") from e
+            except Exception as e:
+                if not is_quota_error(e):
+                    self._record(operation, started_at, error=True)
+                    raise
+                error = e
+            else:
+                self._record(operation, started_at)
+                return result
+            finally:
+                self._release()
+            try:
+                await self._backoff(operation, attempt, error)
+            except LLMUnavailableError:
+                self._record(operation, started_at, error=True)
+                raise
+
+    async def astream(self, runnable: Runnable, inputs: Any, operation: str = "stream",
+                      timeout: Optional[float] = None) -> AsyncIterator[Any]:
+        """
+        Yields `runnable.astream(inputs)` under the shared limit. Quota errors
+        are retried only before the first chunk; `timeout` bounds the wait for
+        each chunk. Close the iterator (e.g. contextlib.aclosing) to free the slot.
+        """
+        timeout = timeout or self.timeout
+        started_at = time.monotonic()
+        for attempt in range(self.max_retries + 1):
+            yielded = False
+            stream = None
+            await self._acquire()
+            try:
+                stream = runnable.astream(inputs).__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), timeout)
+                    except StopAsyncIteration:
+                        break
+                    yielded = True
+                    yield chunk
+            except asyncio.TimeoutError as e:
+                self._count("timeouts")
+                self._record(operation, started_at, error=True)
+                raise LLMUnavailableError(f"LLM stream stalled for {timeout:.0f}s") from e
+            except Exception as e:
+                if yielded or not is_quota_error(e):
+                    self._record(operation, started_at, error=True)
+                    raise
+                error = e
+            else:
+                self._record(operation, started_at)
+                return
+            finally:
+                self._release()
+                if hasattr(stream, "aclose"):
+                    await stream.aclose()
+            try:
+                await self._backoff(operation, attempt, error)
+            except LLMUnavailableError:
+                self._record(operation, started_at, error=True)
+                raise
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = self._in_flight
+            stats["operations"] = {name: dict(op) for name, op in self._operations.items()}
+        stats["max_concurrency"] = self.max_concurrency
+        stats["avg_ms"] = stats["total_ms"] / stats["calls"] if stats["calls"] else 0.0
+        return stats
+
+
+llm_gateway = LLMGateway()
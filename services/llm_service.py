@@ -1,11 +1,7 @@
 import json
-import google.generativeai as genai
-from dotenv import load_dotenv
-import os
+from langchain_core.output_parsers import StrOutputParser
 
-load_dotenv()
-
-genai.configure(api_key=os.getenv("API_KEY"))
+from services.llm_gateway import get_chat_model, llm_gateway
 
 async def generate_structured_pathway(user_topics: list[str], pathway_name: str) -> dict:
     """
@@ -14,13 +10,8 @@ async def generate_structured_pathway(user_topics: list[str], pathway_name: str)
 
 
     """
-    model = genai.GenerativeModel(
-        "gemini-2.5-flash",
-        # 2. Set the generation config to output JSON
-        generation_config=genai.GenerationConfig(
-            response_mime_type="application/json"
-        )
-    )
+    # The shared Gemini client, set to output JSON
+    chain = get_chat_model(json_output=True) | StrOutputParser()
 
     prompt = f"""
 You are an expert learning path designer.
@@ -43,6 +34,6 @@ Return a **strict JSON** like this:
 }}
 """
 
-    response = await model.generate_content_async(prompt)
+    content = await llm_gateway.ainvoke(chain, prompt, operation="pathway")
 
-    return json.loads(response.text)
\ No newline at end of file
+    return json.loads(content)
\ No newline at end of file
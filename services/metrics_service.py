@@ -0,0 +1,35 @@
+import importlib
+from typing import Any, Callable, Dict, Mapping
+
+# Name -> "module:attribute.path" of a zero-argument callable returning a dict.
+# Modules are imported on first collection, so a source that cannot load
+# (e.g. a missing optional backend) reports an error instead of failing the rest.
+METRIC_SOURCES: Dict[str, str] = {
+    "vector_pool": "services.vector_store:pool_stats",
+    "embedding_cache": "services.embedding_cache:cache_stats",
+    "embeddings": "services.embedding_service:embedding_stats",
+    "retrieval_cache": "services.retrieval_cache:retrieval_cache.stats",
+    "hot_index": "services.hot_index:hot_indexes.stats",
+    "dedup": "services.dedup_service:dedup_stats",
+    "answer_cache": "services.answer_cache:answer_cache.stats",
+    "llm_gateway": "services.llm_gateway:llm_gateway.stats",
+}
+
+
+def _resolve(target: str) -> Callable[[], Any]:
+    module_name, _, attribute_path = target.partition(":")
+    value: Any = importlib.import_module(module_name)
+    for attribute in attribute_path.split("."):
+        value = getattr(value, attribute)
+    return value
+
+
+def collect_metrics(sources: Mapping[str, str] = METRIC_SOURCES) -> Dict[str, Any]:
+    """Current counters of every source, or {"error": ...} for a source that failed."""
+    metrics: Dict[str, Any] = {}
+    for name, target in sources.items():
+        try:
+            metrics[name] = _resolve(target)()
+        except Exception as e:
+            metrics[name] = {"error": f"{type(e).__name__}: {e}"}
+    return metrics
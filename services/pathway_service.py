@@ -4,6 +4,7 @@ from sqlalchemy import select  # 👈 And this
 from models import Pathway, Topic
 from schemas.pathway_create import PathwayCreate
 from datetime import datetime
+from services.topic_embedding_service import embed_topics
 
 
 async def save_pathway_to_db(data: PathwayCreate, user_id: int, db: AsyncSession):
@@ -21,6 +22,7 @@ async def save_pathway_to_db(data: PathwayCreate, user_id: int, db: AsyncSession
     await db.flush()  # This assigns an ID to new_pathway.id
 
     # Create and add topic instances
+    topics = []
     for topic_data in data.topics:
         topic = Topic(
             name=topic_data.name,
@@ -31,6 +33,10 @@ async def save_pathway_to_db(data: PathwayCreate, user_id: int, db: AsyncSession
         )
 
         db.add(topic)
+        topics.append(topic)
+
+    # Summaries and quizzes retrieve with these vectors instead of re-embedding
+    await embed_topics(topics)
 
     await db.commit()
 
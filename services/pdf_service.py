@@ -0,0 +1,308 @@
+import io
+import os
+import hashlib
+import queue
+import tempfile
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from pypdf import PdfReader
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# ---------------- CONFIG ----------------
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+MIN_CHUNK_LENGTH = 10
+
+# Parsing is CPU-bound and holds the GIL, so it runs in worker processes.
+# PDF_PARSE_WORKERS=0 parses inline in the calling thread instead.
+PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "25"))
+# Upper bound on page-range tasks submitted but not yet consumed
+MAX_TASKS_IN_FLIGHT = max(1, PARSE_WORKERS) * 2
+
+# Raw bytes, a path on disk, or a seekable file object (e.g. a spooled upload)
+PdfSource = Union[bytes, str, BinaryIO]
+# (filename, source, sha256 of the file contents)
+PdfFile = Tuple[str, PdfSource, str]
+
+
+# ---------------------------------------------------------
+# STREAMING PDF PARSING
+# ---------------------------------------------------------
+
+def _as_stream(source: PdfSource) -> Union[str, BinaryIO]:
+    """Wraps raw bytes in a buffer; paths and file-like objects pass through."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    if isinstance(source, str):
+        return source
+    source.seek(0)
+    return source
+
+
+def _stage_on_disk(source: PdfSource) -> Tuple[str, bool]:
+    """
+    Returns a path process-pool tasks can open, and whether it is a temp file
+    the caller must remove. Bytes and file objects are copied out once, so
+    tasks pickle a path instead of the whole PDF.
+    """
+    if isinstance(source, str):
+        return source, False
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            f.write(source)
+        else:
+            source.seek(0)
+            for block in iter(lambda: source.read(1024 * 1024), b""):
+                f.write(block)
+        return f.name, True
+
+
+def file_sha256(source: PdfSource) -> str:
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+        return digest.hexdigest()
+    stream = open(source, "rb") if isinstance(source, str) else source
+    try:
+        stream.seek(0)
+        for block in iter(lambda: stream.read(1024 * 1024), b""):
+            digest.update(block)
+    finally:
+        if isinstance(source, str):
+            stream.close()
+    return digest.hexdigest()
+
+
+def iter_pdf_pages(
+        filename: str,
+        source: PdfSource,
+        start: int = 0,
+        end: Optional[int] = None,
+        file_hash: Optional[str] = None,
+) -> Iterator[Document]:
+    """
+    Yields one Document per page straight from an in-memory or spooled buffer.
+    Metadata mirrors what PyPDFLoader produced so retrieval code keeps working.
+    Paths are read through an open handle, so only the pages in the range are loaded.
+    """
+    stream = open(source, "rb") if isinstance(source, str) else _as_stream(source)
+    try:
+        reader = PdfReader(stream)
+        total_pages = len(reader.pages)
+        for page_number in range(start, min(end if end is not None else total_pages, total_pages)):
+            yield Document(
+                page_content=reader.pages[page_number].extract_text() or "",
+                metadata={
+                    "source": filename,
+                    "page": page_number,
+                    "total_pages": total_pages,
+                    "file_hash": file_hash,
+                },
+            )
+    finally:
+        if isinstance(source, str):
+            stream.close()
+
+
+def _split_pages(pages: Iterable[Document]) -> Iterator[Document]:
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    for page in pages:
+        for chunk_index, chunk in enumerate(text_splitter.split_documents([page])):
+            chunk.metadata["chunk_index"] = chunk_index
+            yield chunk
+
+
+def _parse_page_range(
+        filename: str,
+        source: str,
+        start: int,
+        end: int,
+        file_hash: Optional[str],
+) -> List[Document]:
+    """Process-pool task: parse and split one page range of one file."""
+    return list(_split_pages(iter_pdf_pages(filename, source, start, end, file_hash)))
+
+
+def count_pages(source: PdfSource) -> int:
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return len(PdfReader(f).pages)
+    return len(PdfReader(_as_stream(source)).pages)
+
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_lock = threading.Lock()
+
+
+def get_parse_pool() -> Optional[ProcessPoolExecutor]:
+    """Lazily creates the process-wide parse pool (spawned, so no DB/event-loop state is forked)."""
+    global _parse_pool
+    if PARSE_WORKERS <= 0:
+        return None
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=PARSE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _parse_pool
+
+
+def shutdown_parse_pool():
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(wait=False, cancel_futures=True)
+            _parse_pool = None
+
+
+def _count_pages(pages: Iterable[Document], stats: Dict[str, int]) -> Iterator[Document]:
+    for page in pages:
+        stats["pages_parsed"] = stats.get("pages_parsed", 0) + 1
+        yield page
+
+
+def iter_pdf_chunks(files: Iterable[PdfFile], stats: Optional[Dict[str, int]] = None) -> Iterator[Document]:
+    """
+    Yields chunks for every file in upload order.
+    If `stats` is given, `pages_total` is set once the files are opened and
+    `pages_parsed` is kept up to date as ranges complete.
+
+    Each file is written to disk once and cut into page ranges that are parsed
+    and split in the process pool; tasks carry the path, not the PDF. Page
+    counts are taken in the pool too, once per file. At most
+    MAX_TASKS_IN_FLIGHT ranges are outstanding at once and results are
+    consumed strictly in submission order, so output is deterministic and
+    memory stays bounded even though ranges finish out of order.
+    """
+    stats = stats if stats is not None else {}
+    files = list(files)
+    pool = get_parse_pool()
+    if pool is None:
+        stats["pages_total"] = sum(count_pages(source) for _, source, _ in files)
+        for filename, source, file_hash in files:
+            yield from _split_pages(_count_pages(iter_pdf_pages(filename, source, file_hash=file_hash), stats))
+        return
+
+    staged = []
+    pending = deque()
+    try:
+        for filename, source, file_hash in files:
+            path, owned = _stage_on_disk(source)
+            staged.append((filename, path, owned, file_hash))
+        page_counts = list(pool.map(count_pages, [path for _, path, _, _ in staged]))
+        stats["pages_total"] = sum(page_counts)
+
+        def _tasks():
+            for (filename, path, _, file_hash), total_pages in zip(staged, page_counts):
+                for start in range(0, total_pages, PAGES_PER_TASK):
+                    yield (filename, path, start, min(start + PAGES_PER_TASK, total_pages), file_hash)
+
+        def _collect(future, page_count):
+            chunks = future.result()
+            stats["pages_parsed"] = stats.get("pages_parsed", 0) + page_count
+            return chunks
+
+        for task in _tasks():
+            pending.append((pool.submit(_parse_page_range, *task), task[3] - task[2]))
+            if len(pending) >= MAX_TASKS_IN_FLIGHT:
+                yield from _collect(*pending.popleft())
+        while pending:
+            yield from _collect(*pending.popleft())
+    finally:
+        for future, _ in pending:
+            future.cancel()
+        for _, path, owned, _ in staged:
+            if owned:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def sanitize_chunks(chunks: Iterable[Document], stats: Dict[str, int]) -> Iterator[Document]:
+    """
+    Forces chunk content to clean strings and drops empty or tiny fragments.
+    Running totals are written into `stats` as the stream is consumed.
+    """
+    stats.setdefault("chunks_seen", 0)
+    stats.setdefault("chunks_kept", 0)
+    for chunk in chunks:
+        stats["chunks_seen"] += 1
+        content = chunk.page_content
+
+        if content is None:
+            continue
+
+        # Convert to string and remove null bytes/whitespace
+        clean_text = str(content).replace('\x00', '').strip()
+
+        # REJECT: Empty strings or tiny fragments (less than 10 chars)
+        if len(clean_text) < MIN_CHUNK_LENGTH:
+            continue
+
+        chunk.page_content = clean_text
+        stats["chunks_kept"] += 1
+        yield chunk
+
+
+def iter_batches(items: Iterable[Document], batch_size: int) -> Iterator[List[Document]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+_DONE = object()
+
+
+def prefetch(items: Iterable, max_pending: int) -> Iterator:
+    """
+    Runs the producer iterable on a helper thread and hands items over through a
+    bounded queue, so parsing keeps going while the consumer is embedding.
+    Producer exceptions are re-raised in the consuming thread.
+    """
+    buffer: "queue.Queue" = queue.Queue(maxsize=max_pending)
+    stop = threading.Event()
+
+    def _put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce():
+        try:
+            for item in items:
+                if not _put(item):
+                    return
+            _put(_DONE)
+        except BaseException as e:
+            _put(e)
+
+    producer = threading.Thread(target=_produce, name="pdf-prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
@@ -0,0 +1,123 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Set
+
+import asyncpg
+from dotenv import load_dotenv
+from sqlalchemy import text, update
+
+from core.db import get_session_context
+from models.ingestion_job import IngestionJob
+
+load_dotenv()
+
+PROGRESS_CHANNEL = "ingestion_progress"
+PROGRESS_INTERVAL_SECONDS = float(os.getenv("INGESTION_PROGRESS_INTERVAL", "1"))
+TERMINAL_STATUSES = {"COMPLETED", "FAILED"}
+
+
+# ---------------------------------------------------------
+# SNAPSHOTS (PIPELINE SIDE)
+# ---------------------------------------------------------
+
+def progress_snapshot(stats: Dict[str, int], started_at: float, status: str) -> dict:
+    """
+    Turns the pipeline's running counters into a progress event.
+    The ETA extrapolates total chunks from the chunks-per-page seen so far.
+    """
+    elapsed = time.monotonic() - started_at
+    pages_total = stats.get("pages_total", 0)
+    pages_parsed = stats.get("pages_parsed", 0)
+    chunks_kept = stats.get("chunks_kept", 0)
+    chunks_unique = chunks_kept - stats.get("chunks_near_duplicate", 0)
+    chunks_embedded = stats.get("chunks_embedded", 0)
+
+    eta_seconds = None
+    if status not in TERMINAL_STATUSES and pages_parsed and chunks_embedded:
+        estimated_chunks = (chunks_unique / pages_parsed) * pages_total + stats.get("chunks_reused", 0)
+        fraction = min(1.0, chunks_embedded / max(estimated_chunks, 1))
+        if fraction > 0:
+            eta_seconds = round(elapsed * (1 - fraction) / fraction, 1)
+
+    return {
+        "status": status,
+        "pages_total": pages_total,
+        "pages_parsed": pages_parsed,
+        "chunks_seen": stats.get("chunks_seen", 0),
+        "chunks_sanitized": chunks_kept,
+        "chunks_near_duplicate": stats.get("chunks_near_duplicate", 0),
+        "chunks_reused": stats.get("chunks_reused", 0),
+        "chunks_resumed": stats.get("chunks_resumed", 0),
+        "chunks_embedded": chunks_embedded,
+        "batches_retried": stats.get("batches_retried", 0),
+        "elapsed_seconds": round(elapsed, 1),
+        "eta_seconds": 0 if status == "COMPLETED" else eta_seconds,
+    }
+
+
+async def publish_progress(job_id: uuid.UUID, pathway_id: uuid.UUID, snapshot: dict):
+    """Stores the latest snapshot on the job row and fans it out with NOTIFY."""
+    event = {"job_id": str(job_id), "pathway_id": str(pathway_id), **snapshot}
+    async with get_session_context() as db:
+        await db.execute(update(IngestionJob).where(IngestionJob.id == job_id).values(progress=snapshot))
+        await db.execute(text("SELECT pg_notify(:channel, :payload)"),
+                         {"channel": PROGRESS_CHANNEL, "payload": json.dumps(event)})
+        await db.commit()
+
+
+# ---------------------------------------------------------
+# SUBSCRIPTIONS (API SIDE)
+# ---------------------------------------------------------
+
+class ProgressBroker:
+    """
+    One LISTEN connection per API process, fanned out to in-memory queues.
+    Open progress streams cost no database queries after their first snapshot,
+    no matter how many tabs are watching.
+    """
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self._conn: Optional[asyncpg.Connection] = None
+        self._lock = asyncio.Lock()
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        event = json.loads(payload)
+        for queue in list(self._subscribers.get(event.get("pathway_id"), ())):
+            if queue.full():
+                # Slow consumer: drop the stale event, the next one supersedes it
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def _ensure_listening(self):
+        async with self._lock:
+            if self._conn is None or self._conn.is_closed():
+                self._conn = await asyncpg.connect(self.dsn)
+                await self._conn.add_listener(PROGRESS_CHANNEL, self._on_notify)
+
+    @asynccontextmanager
+    async def subscribe(self, pathway_id: uuid.UUID) -> AsyncIterator[asyncio.Queue]:
+        """Yields a queue that receives every progress event for the pathway."""
+        await self._ensure_listening()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=16)
+        key = str(pathway_id)
+        self._subscribers[key].add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers[key].discard(queue)
+            if not self._subscribers[key]:
+                del self._subscribers[key]
+
+    async def close(self):
+        if self._conn is not None and not self._conn.is_closed():
+            await self._conn.close()
+
+
+progress_broker = ProgressBroker(os.getenv("DATABASE_URL", "").replace("postgresql+asyncpg", "postgresql"))
@@ -1,29 +1,25 @@
 import os
 import json
-import asyncio
 
 from dotenv import load_dotenv
-from langchain_postgres import PGVector
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_huggingface import HuggingFaceEndpointEmbeddings
+from services.embedding_service import get_query_embedding_function
+from services.topic_embedding_service import QUIZ_CONTEXT_K, topic_query_vector
+from services.retrieval_cache import collection_version_of
+from services.context_service import optimize_context, join_context
+from services.vector_store import get_vector_store
+from services.llm_gateway import get_chat_model, llm_gateway
 load_dotenv()
 
 # ---------------- CONFIG ----------------
 
-embedding_function = HuggingFaceEndpointEmbeddings(
-    model="sentence-transformers/all-MiniLM-L6-v2",
-    huggingfacehub_api_token=os.getenv("HF_TOKEN")
-)
+embedding_function = get_query_embedding_function()
 
 
 SYNC_DB_URL = os.getenv("VECTOR_DB_URL")
 
-model = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash",
-    google_api_key=os.getenv("API_KEY"),
-)
+model = get_chat_model()
 
 
 # ---------------------------------------------------------
@@ -32,31 +28,20 @@ model = ChatGoogleGenerativeAI(
 
 async def generate_quiz(topic, difficulty, num_questions):
     """
-    Uses PGVector RAG + Gemini to generate topic quizzes.
+    Uses pgvector RAG + Gemini to generate topic quizzes.
     """
-    collection_name = f"pathway_{topic.pathway_id}"
-    sync_url = SYNC_DB_URL
-
-    # --- THE SYNC THREAD BRIDGE ---
-    def get_context_sync():
-        try:
-            vector_store = PGVector(
-                collection_name=collection_name,
-                connection=sync_url,
-                embeddings=embedding_function,
-                use_jsonb=True,
-            )
-
-            query = f"{topic.name} {' '.join(topic.keywords or [])}"
-            # Retrieve relevant chunks
-            docs = vector_store.similarity_search(query, k=4)
-            return "\n\n".join(d.page_content for d in docs)
-        except Exception as e:
-            print(f"❌ Quiz Context Sync Error: {e}")
-            return ""
-
-    # 1. Run retrieval in thread to avoid async driver conflicts
-    retrieved_context = await asyncio.to_thread(get_context_sync)
+    # 1. Retrieve relevant chunks over the asyncpg engine
+    try:
+        vector_store = get_vector_store(topic.pathway_id, embedding_function)
+
+        # The topic's stored vector: no embedding round trip on quiz regeneration
+        results = await vector_store.asimilarity_search_with_score_by_vector(
+            await topic_query_vector(topic), k=QUIZ_CONTEXT_K, version=collection_version_of(topic)
+        )
+        retrieved_context = join_context(optimize_context(results))
+    except Exception as e:
+        print(f"❌ Quiz Context Error: {e}")
+        retrieved_context = ""
 
     if not retrieved_context:
         print("⚠️ Warning: No context retrieved for quiz generation.")
@@ -96,12 +81,12 @@ async def generate_quiz(topic, difficulty, num_questions):
     rag_chain = prompt | model | StrOutputParser()
 
     # 3. Send to Gemini
-    content = await rag_chain.ainvoke({
+    content = await llm_gateway.ainvoke(rag_chain, {
         "context": retrieved_context,
         "topic_name": topic.name,
         "difficulty": difficulty,
         "num_questions": num_questions
-    })
+    }, operation="quiz")
 
     # 4. Parse JSON automatically
     print(f"DEBUG: Model Response:\n{content}")
@@ -116,41 +101,29 @@ async def generate_quiz(topic, difficulty, num_questions):
 async def chat_with_pdfs(topic, user_question: str):
     """
     Answers a user's question using only the uploaded PDFs
-    and returns answer with source references using PGVector.
+    and returns answer with source references using pgvector.
     """
-    collection_name = f"pathway_{topic.pathway_id}"
-    sync_url = SYNC_DB_URL
-
-    # --- THE SYNC THREAD BRIDGE ---
-    def get_docs_and_context_sync():
-        try:
-            vector_store = PGVector(
-                collection_name=collection_name,
-                connection=sync_url,
-                embeddings=embedding_function,
-                use_jsonb=True,
-            )
-
-            # Retrieve relevant chunks
-            docs = vector_store.similarity_search(user_question, k=4)
-
-            context_blocks = []
-            sources = []
-            for i, doc in enumerate(docs):
-                context_blocks.append(f"[Source {i + 1}] {doc.page_content}")
-                sources.append({
-                    "source_id": i + 1,
-                    "page": doc.metadata.get("page"),
-                    "document": doc.metadata.get("source")
-                })
-
-            return "\n\n".join(context_blocks), sources
-        except Exception as e:
-            print(f"❌ Chat PDFs Sync Error: {e}")
-            return "", []
-
-    # 1. Run retrieval in thread
-    context_text, sources = await asyncio.to_thread(get_docs_and_context_sync)
+    # 1. Retrieve relevant chunks over the asyncpg engine
+    try:
+        vector_store = get_vector_store(topic.pathway_id, embedding_function)
+        results = await vector_store.asimilarity_search_with_score(
+            user_question, k=4, version=collection_version_of(topic)
+        )
+        docs = optimize_context(results)
+
+        context_blocks = []
+        sources = []
+        for i, doc in enumerate(docs):
+            context_blocks.append(f"[Source {i + 1}] {doc.page_content}")
+            sources.append({
+                "source_id": i + 1,
+                "page": doc.metadata.get("page"),
+                "document": doc.metadata.get("source")
+            })
+        context_text = "\n\n".join(context_blocks)
+    except Exception as e:
+        print(f"❌ Chat PDFs Error: {e}")
+        context_text, sources = "", []
 
     if not context_text:
         return {
@@ -189,10 +162,10 @@ async def chat_with_pdfs(topic, user_question: str):
     rag_chain = prompt | model | StrOutputParser()
 
     # 3. Generate response
-    response_content = await rag_chain.ainvoke({
+    response_content = await llm_gateway.ainvoke(rag_chain, {
         "context": context_text,
         "question": user_question
-    })
+    }, operation="quiz_chat")
 
     # 4. Clean and parse JSON
     if "```" in response_content:
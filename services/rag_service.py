@@ -1,32 +1,48 @@
 import os
-import tempfile
 import uuid
 import asyncio
-from typing import List, Tuple
 import time
+from contextlib import aclosing
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
 from dotenv import load_dotenv
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import create_async_engine
 import traceback
 from core.db import get_session_context
-from models import Pathway, Topic
+from models import Topic
 from models.pathway import EmbeddingStatus
 
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_postgres import PGVector
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, AIMessage
-from langchain_huggingface import HuggingFaceEndpointEmbeddings
+from langchain_core.documents import Document
 
 from schemas.chat_request import ChatMessage
+from services.pdf_service import PdfSource, iter_pdf_chunks, sanitize_chunks, iter_batches, prefetch, file_sha256
+from services.embedding_cache import CachedEmbeddings, find_document_embeddings
+from services.embedding_scheduler import RateLimitedEmbeddings, get_embedding_scheduler, current_job_stats
+from services.embedding_service import EMBEDDING_MODEL, get_embedding_function, get_query_embedding_function, is_remote_backend
+from services.topic_embedding_service import SUMMARY_CONTEXT_K, topic_query_vector
+from services.document_service import finalize_documents, bump_collection_version, refresh_pathway_status
+from services.retrieval_cache import collection_version_of
+from services.context_service import optimize_context, join_context
+from services.answer_cache import ANSWER_CACHE_ENABLED, answer_cache
+from services.llm_gateway import LLMUnavailableError, get_chat_model, llm_gateway
+from services.progress_service import progress_snapshot, PROGRESS_INTERVAL_SECONDS
+from services.dedup_service import drop_near_duplicates
+from services.vector_store import BulkChunkWriter, get_vector_store, stored_chunk_keys
 
 load_dotenv()
 
-embedding_function = HuggingFaceEndpointEmbeddings(
-    model="sentence-transformers/all-MiniLM-L6-v2",
-    huggingfacehub_api_token=os.getenv("HF_TOKEN")
+embedding_function = get_embedding_function()
+# Retrieval reuses recent query vectors instead of re-embedding repeated questions
+query_embedding_function = get_query_embedding_function()
+
+# Ingestion goes through the persistent content-addressed cache; only misses
+# reach the provider, and remote calls share the process-wide rate limit.
+ingest_embedding_function = CachedEmbeddings(
+    RateLimitedEmbeddings(embedding_function) if is_remote_backend() else embedding_function,
+    model_name=EMBEDDING_MODEL,
 )
 
 ASYNC_DB_URL = os.getenv("DATABASE_URL")
@@ -35,99 +51,183 @@ SYNC_DB_URL = os.getenv("VECTOR_DB_URL")
 if not ASYNC_DB_URL or not SYNC_DB_URL:
     raise ValueError("Both DATABASE_URL and VECTOR_DB_URL must be set")
 
-model = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash",
-    google_api_key=os.getenv("API_KEY"),
-)
+model = get_chat_model()
 
-async def process_and_embed_pdfs(pathway_id: uuid.UUID, file_contents: List[Tuple[str, bytes]]):
-    async with get_session_context() as db:
-        try:
-            all_chunks = []
-            with tempfile.TemporaryDirectory() as temp_dir:
-                for filename, contents in file_contents:
-                    file_path = os.path.join(temp_dir, filename)
-                    with open(file_path, "wb") as f:
-                        f.write(contents)
-
-                    loader = PyPDFLoader(file_path)
-                    documents = loader.load()
-
-                    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-                    chunks = text_splitter.split_documents(documents)
-                    all_chunks.extend(chunks)
-
-            # --- 🔥 THE CRITICAL FIX: AGGRESSIVE TYPE ENFORCEMENT ---
-            sanitized_chunks = []
-            for chunk in all_chunks:
-                # Force content to string safely
-                content = chunk.page_content
-
-                if content is None:
-                    continue
-
-                # Convert to string and remove null bytes/whitespace
-                clean_text = str(content).replace('\x00', '').strip()
+# Chat retrieval fuses full-text and vector results (see PathwayVectorStore.ahybrid_search)
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "true").lower() == "true"
+# Word overlap above which a condensed follow-up reuses the raw question's results
+SPECULATIVE_REQUERY_OVERLAP = float(os.getenv("SPECULATIVE_REQUERY_OVERLAP", "0.6"))
 
-                # REJECT: Empty strings or tiny fragments (less than 10 chars)
-                if len(clean_text) < 10:
-                    continue
+# Chunks per embedding call, and how many parsed batches may wait ahead of it
+EMBED_BATCH_SIZE = 50
+PREFETCH_BATCHES = 2
 
-                # Update the object and keep it
-                chunk.page_content = clean_text
-                sanitized_chunks.append(chunk)
 
-            print(f"🧼 TRACE: Sanitize complete. {len(all_chunks)} -> {len(sanitized_chunks)} chunks.")
-
-            if not sanitized_chunks:
-                raise ValueError("No valid text found in the PDFs.")
+async def process_and_embed_pdfs(
+        pathway_id: uuid.UUID,
+        file_contents: List[Tuple[str, PdfSource, Optional[uuid.UUID]]],
+        on_batch: Optional[Callable[[int, int], Awaitable[None]]] = None,
+        on_progress: Optional[Callable[[dict], Awaitable[None]]] = None,
+        batch_offset: int = 0,
+) -> bool:
+    """
+    Parses, embeds and appends the PDFs to the pathway's rows in document_chunks,
+    then marks the pathway and its documents COMPLETED or FAILED. Each entry is
+    (filename, source, document_id); chunks are tagged with their document_id
+    so a single document can later be removed.
+
+    Every batch is committed as soon as it is written. A run that picks up a
+    crashed job skips the chunks its documents already have in document_chunks,
+    so only the rest is embedded; a failed run removes the partial rows.
+    `on_batch(batch_number, chunk_count)` is awaited on the event loop after each
+    batch is committed, numbered on from `batch_offset`, and `on_progress(snapshot)`
+    receives live counters every few seconds and once more with the final status.
+    """
+    loop = asyncio.get_running_loop()
+    document_ids = list(dict.fromkeys(document_id for _, _, document_id in file_contents if document_id))
+    started_at = time.monotonic()
+    # Shared with the worker thread; only read on the event loop
+    stats = {"chunks_reused": 0, "chunks_embedded": 0}
+
+    async def report_progress():
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL_SECONDS)
+            try:
+                await on_progress(progress_snapshot(stats, started_at, "PROCESSING"))
+            except Exception as e:
+                print(f"⚠️ Progress report failed: {e}")
+
+    reporter = asyncio.create_task(report_progress()) if on_progress else None
 
+    async with get_session_context() as db:
+        try:
             def sync_storage_logic():
-                print("📡 TRACE: Initializing Sync PGVector Handshake...")
-                clean_url = SYNC_DB_URL.replace("postgresql+asyncpg", "postgresql")
+                print("📡 TRACE: Opening bulk writer for document_chunks...")
+                current_job_stats.set(stats)
 
                 try:
-                    # 1. Initialize the VectorStore (without adding docs yet)
-                    vector_store = PGVector(
-                        embeddings=embedding_function,
-                        collection_name=f"pathway_{pathway_id}",
-                        connection=clean_url,
-                        use_jsonb=True,
-                    )
-
-                    # 2. Add documents in batches to avoid 429 errors
-                    batch_size = 50  # Stay well under the 1500 RPM limit
-                    for i in range(0, len(sanitized_chunks), batch_size):
-                        batch = sanitized_chunks[i: i + batch_size]
-                        print(f"📦 DEBUG: Embedding batch {i // batch_size + 1}...")
-
-                        vector_store.add_documents(batch)
-
-                        # 3. Small sleep to let the Google API quota "breathe"
-                        time.sleep(1)
-
-                    print(f"✅ TRACE: Successfully stored {len(sanitized_chunks)} chunks.")
+                    # Chunks committed by an earlier attempt of this job
+                    stored = stored_chunk_keys(document_ids)
+                    stats["chunks_resumed"] = 0
+                    if stored:
+                        print(f"⏩ TRACE: Resuming with {len(stored)} chunks already stored.")
+
+                    with BulkChunkWriter(pathway_id) as writer:
+                        # 1. Files already ingested elsewhere (same hash, same model) are
+                        # copied over with their vectors: no parsing, no embedding calls.
+                        fresh_files = []
+                        document_by_hash = {}
+                        for filename, source, document_id in file_contents:
+                            file_hash = file_sha256(source)
+                            if file_hash in document_by_hash:
+                                # pathway_document is unique per (pathway, file_hash), so a repeat
+                                # of the same content is the same document: ingest it once
+                                print(f"⏭️ TRACE: Skipping {filename}, identical to an earlier file in this job.")
+                                continue
+                            document_by_hash[file_hash] = str(document_id) if document_id else None
+                            reused = find_document_embeddings(file_hash, EMBEDDING_MODEL)
+                            if not reused:
+                                fresh_files.append((filename, source, file_hash))
+                                continue
+
+                            texts, vectors, metadatas = zip(*reused)
+                            for metadata in metadatas:
+                                metadata["source"] = filename
+                                metadata["document_id"] = document_by_hash[file_hash]
+                            writer.write(texts, vectors, metadatas)
+                            stats["chunks_reused"] += len(texts)
+                            stats["chunks_embedded"] += len(texts)
+                            print(f"♻️ TRACE: Reused {len(texts)} chunks for duplicate file {filename}.")
+                        writer.commit()
+
+                        # 2. Stream pages -> chunks -> sanitized batches. Parsing runs in the
+                        # process pool and stays at most a few batches ahead of embedding,
+                        # so memory no longer grows with the total page count.
+                        chunks = sanitize_chunks(iter_pdf_chunks(fresh_files, stats), stats)
+                        # Repeated headers, footers and boilerplate slides are dropped
+                        # before they cost an embedding call or a row.
+                        chunks = drop_near_duplicates(chunks, stats)
+                        # Filtered after deduplication, which must see the same stream on every attempt
+                        chunks = _skip_stored(chunks, stored, document_by_hash, stats)
+                        batches = prefetch(iter_batches(chunks, EMBED_BATCH_SIZE), max_pending=PREFETCH_BATCHES)
+
+                        def embed_batch(batch):
+                            for chunk in batch:
+                                chunk.metadata["embedding_model"] = EMBEDDING_MODEL
+                                chunk.metadata["document_id"] = document_by_hash.get(chunk.metadata.get("file_hash"))
+                            return batch, ingest_embedding_function.embed_documents([c.page_content for c in batch])
+
+                        # 3. Several batches are embedded at once; pacing and 429 backoff
+                        # come from the shared scheduler. Writes stay on this thread, in
+                        # order, because COPY owns the writer's connection.
+                        scheduler = get_embedding_scheduler()
+                        for batch_number, (batch, vectors) in enumerate(
+                                scheduler.run_in_order(embed_batch, batches), start=batch_offset + 1):
+                            stored_count = writer.write_documents(batch, vectors)
+                            writer.commit()
+                            print(f"📦 DEBUG: Wrote batch {batch_number} ({stored_count} chunks).")
+                            stats["chunks_embedded"] += stored_count
+                            if on_batch:
+                                asyncio.run_coroutine_threadsafe(on_batch(batch_number, stored_count), loop).result()
+
+                        print(f"🧼 TRACE: Sanitize complete. {stats.get('chunks_seen', 0)} -> {stats.get('chunks_kept', 0)} chunks, "
+                              f"{stats.get('chunks_near_duplicate', 0)} near-duplicates dropped.")
+
+                        if not writer.rows_written and not stored:
+                            raise ValueError("No valid text found in the PDFs.")
+
+                    print(f"✅ TRACE: Successfully stored {writer.rows_written} chunks.")
                     return True
                 except Exception as e:
-                    print(f"🚨 PGVector INTERNAL ERROR: {type(e).__name__}: {str(e)}")
+                    print(f"🚨 Bulk write ERROR: {type(e).__name__}: {str(e)}")
                     raise e
 
             await asyncio.to_thread(sync_storage_logic)
 
-            # Update Pathway Status
-            pathway = await db.get(Pathway, pathway_id)
-            if pathway:
-                pathway.embedding_status = EmbeddingStatus.COMPLETED
-                await db.commit()
+            # Update Pathway and Document Status
+            await finalize_documents(db, pathway_id, document_ids, succeeded=True)
+            # New chunks are visible: retire this pathway's cached retrieval results
+            await bump_collection_version(db, pathway_id)
+            if await refresh_pathway_status(db, pathway_id) == EmbeddingStatus.COMPLETED:
                 print("🏁 TRACE: Pathway is now LIVE.")
+            await db.commit()
+            await _final_progress(reporter, on_progress, progress_snapshot(stats, started_at, "COMPLETED"))
+            return True
 
         except Exception as e:
             print(f"🚨 CRITICAL RAG FAILURE: {str(e)}")
             traceback.print_exc()
-            pathway = await db.get(Pathway, pathway_id)
-            if pathway:
-                pathway.embedding_status = EmbeddingStatus.FAILED
-                await db.commit()
+            await db.rollback()
+            await finalize_documents(db, pathway_id, document_ids, succeeded=False)
+            # Batches committed before the failure were visible until now
+            await bump_collection_version(db, pathway_id)
+            # Only this run's documents failed; the pathway stays COMPLETED if others are searchable
+            await refresh_pathway_status(db, pathway_id)
+            await db.commit()
+            await _final_progress(reporter, on_progress, progress_snapshot(stats, started_at, "FAILED"))
+            return False
+
+
+def _skip_stored(chunks, stored, document_by_hash, stats):
+    for chunk in chunks:
+        key = (document_by_hash.get(chunk.metadata.get("file_hash")), chunk.metadata.get("page"),
+               chunk.metadata.get("chunk_index"))
+        if key in stored:
+            stats["chunks_resumed"] += 1
+            stats["chunks_embedded"] += 1
+            continue
+        yield chunk
+
+
+async def _final_progress(reporter, on_progress, snapshot: dict):
+    if reporter:
+        reporter.cancel()
+    if on_progress:
+        try:
+            await on_progress(snapshot)
+        except Exception as e:
+            print(f"⚠️ Progress report failed: {e}")
+
 # ---------------------------------------------------------
 # RAG SUMMARY GENERATION
 # ---------------------------------------------------------
@@ -135,39 +235,7 @@ async def process_and_embed_pdfs(pathway_id: uuid.UUID, file_contents: List[Tupl
 async_engine = create_async_engine(os.getenv("DATABASE_URL"))
 
 
-async def generate_summary_for_topic(topic: Topic) -> str:
-    collection_name = f"pathway_{topic.pathway_id}"
-    print(f"🔍 TRACE: Generating summary for {topic.name}")
-
-    # Use the clean Sync URL (port 5432 or 6543, no asyncpg)
-    sync_url = SYNC_DB_URL
-
-    # This inner function handles all the "Sync" work of PGVector
-    def get_context_sync():
-        try:
-            vector_store = PGVector(
-                collection_name=collection_name,
-                connection=sync_url,
-                embeddings=embedding_function,  # Ensure this is 'embeddings'
-                use_jsonb=True,
-            )
-
-            search_query = f"{topic.name} {' '.join(topic.keywords or [])}"
-            # Use k=5 for better context
-            docs = vector_store.similarity_search(search_query, k=5)
-            return "\n\n".join(doc.page_content for doc in docs)
-        except Exception as e:
-            print(f"❌ Inner Sync Error: {e}")
-            return ""
-
-    # 1. Run the retrieval in a thread to avoid driver/async conflicts
-    context = await asyncio.to_thread(get_context_sync)
-
-    if not context:
-        return "Could not retrieve context from the study materials."
-
-    # 2. Now use the LLM to process the context (this part is safe to await)
-    prompt_template = """
+SUMMARY_PROMPT = """
     You are an expert academic mentor and technical writer. Your goal is to transform the provided context into a high-quality, comprehensive study guide for the topic: "{topic_name}".
 
     ### INSTRUCTIONS:
@@ -190,88 +258,353 @@ async def generate_summary_for_topic(topic: Topic) -> str:
     ### OUTPUT (Markdown Format):
     """
 
-    prompt = ChatPromptTemplate.from_template(prompt_template)
+# Appended when resuming a summary whose first part was already streamed and saved
+SUMMARY_CONTINUATION = """
+    ### ALREADY WRITTEN:
+    {partial}
+
+    ### TASK:
+    The study guide above was interrupted. Continue it exactly where it stops, without repeating any of it.
+    """
+
+# How often a streaming summary's partial Markdown is saved
+SUMMARY_FLUSH_SECONDS = float(os.getenv("SUMMARY_FLUSH_SECONDS", "2"))
+NO_SUMMARY_CONTEXT = "Could not retrieve context from the study materials."
+
+
+async def _summary_context(topic: Topic) -> str:
+    # Retrieve on the event loop over the asyncpg engine
+    try:
+        vector_store = get_vector_store(topic.pathway_id, query_embedding_function)
+
+        # Use k=5 for better context
+        results = await vector_store.asimilarity_search_with_score_by_vector(
+            await topic_query_vector(topic), k=SUMMARY_CONTEXT_K, version=collection_version_of(topic)
+        )
+        # Weak matches, duplicates and split overlap are trimmed before prompting
+        return join_context(optimize_context(results))
+    except Exception as e:
+        print(f"❌ Retrieval Error: {e}")
+        return ""
+
+
+async def generate_summary_for_topic(topic: Topic) -> str:
+    print(f"🔍 TRACE: Generating summary for {topic.name}")
+
+    # 1. Retrieve the context
+    context = await _summary_context(topic)
+
+    if not context:
+        return NO_SUMMARY_CONTEXT
+
+    # 2. Now use the LLM to process the context (this part is safe to await)
+    prompt = ChatPromptTemplate.from_template(SUMMARY_PROMPT)
     rag_chain = prompt | model | StrOutputParser()
 
-    return await rag_chain.ainvoke({
+    return await llm_gateway.ainvoke(rag_chain, {
         "context": context,
         "topic_name": topic.name
-    })
+    }, operation="summary")
+
+
+async def _save_summary_draft(topic_id: int, draft: Optional[str], summary: Optional[str] = None):
+    """Saves a partial draft, or with `summary` stores the finished guide and clears the draft."""
+    statement = update(Topic).where(Topic.id == topic_id)
+    if summary is not None:
+        statement = statement.values(summary=summary, summary_draft=None)
+    else:
+        # Once a summary is stored (e.g. by the non-streaming endpoint) there is nothing to resume
+        statement = statement.where(Topic.summary.is_(None)).values(summary_draft=draft)
+    async with get_session_context() as db:
+        await db.execute(statement)
+        await db.commit()
+
+
+async def stream_summary_for_topic(topic: Topic) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    Streams the study guide as ("token", {"content"}) events and ends with
+    ("done", {...}). The Markdown written so far is saved to topic.summary_draft
+    every few seconds, so a client that disconnects can come back: the saved
+    draft is replayed first and only the rest is generated. The finished guide
+    moves to topic.summary and the draft is cleared.
+    """
+    started_at = time.monotonic()
+    draft = topic.summary_draft or ""
+    resumed = bool(draft)
+    if draft:
+        yield "token", {"content": draft}
+
+    context = await _summary_context(topic)
+    if not context:
+        yield "error", {"detail": NO_SUMMARY_CONTEXT}
+        return
+
+    template = SUMMARY_PROMPT + (SUMMARY_CONTINUATION if resumed else "")
+    chain = ChatPromptTemplate.from_template(template) | model | StrOutputParser()
+    inputs = {"context": context, "topic_name": topic.name}
+    if resumed:
+        inputs["partial"] = draft
+
+    saved_length, last_flush = len(draft), time.monotonic()
+    completed = False
+    try:
+        async with aclosing(llm_gateway.astream(chain, inputs, operation="summary_stream")) as tokens:
+            async for token in tokens:
+                if not token:
+                    continue
+                draft += token
+                yield "token", {"content": token}
+                if time.monotonic() - last_flush >= SUMMARY_FLUSH_SECONDS:
+                    await _save_summary_draft(topic.id, draft)
+                    saved_length, last_flush = len(draft), time.monotonic()
+        completed = True
+    except Exception as e:
+        print(f"🚨 Summary stream failed: {e}")
+        yield "error", {"detail": f"Summary generation failed: {str(e)}"}
+        return
+    finally:
+        # Also runs when the client disconnects and the generator is closed
+        if not completed and len(draft) > saved_length:
+            try:
+                await _save_summary_draft(topic.id, draft)
+            except Exception as e:
+                print(f"⚠️ Could not save summary draft for topic {topic.id}: {e}")
+
+    await _save_summary_draft(topic.id, None, summary=draft)
+    yield "done", {"resumed": resumed, "length": len(draft), "elapsed_ms": round((time.monotonic() - started_at) * 1000)}
 
 
 # ---------------------------------------------------------
 # CHAT WITH PATHWAY PDFS
 # ---------------------------------------------------------
 
-async def chat_with_pathway_pdfs(
-        pathway_id: uuid.UUID,
-        user_query: str,
-        chat_history: List[ChatMessage] = [],
-) -> str:
-    collection_name = f"pathway_{pathway_id}"
-    sync_url = SYNC_DB_URL  # Ensure this is your clean sync URL
+NO_CONTEXT_ANSWER = "I'm sorry, I couldn't find any relevant information in the uploaded documents to answer that."
 
-    # 1. Convert our ChatMessage objects to LangChain Message objects
+
+def _to_langchain_history(chat_history: List[ChatMessage]) -> list:
+    # Convert our ChatMessage objects to LangChain Message objects
     langchain_history = []
     for msg in chat_history[-6:]:
         if msg.role == "user":
             langchain_history.append(HumanMessage(content=msg.content))
         else:
             langchain_history.append(AIMessage(content=msg.content))
+    return langchain_history
 
-    # --- THE SYNC THREAD BRIDGE ---
-    def get_context_and_standalone_query_sync():
-        try:
-            # Re-initialize the sync vector store
-            vector_store = PGVector(
-                collection_name=collection_name,
-                connection=sync_url,
-                embeddings=embedding_function,
-                use_jsonb=True,
-            )
 
-            # Step A: Contextualize the question (handle "it", "they", etc.)
-            # If history exists, ask the model to re-write the query
-            standalone_query = user_query
-            if langchain_history:
-                condense_prompt = ChatPromptTemplate.from_messages([
-                    ("system",
-                     "Given the chat history and a follow-up question, rephrase the follow-up to be a standalone question."),
-                    MessagesPlaceholder("chat_history"),
-                    ("human", "{input}")
-                ])
-                # We can run a small chain here or just use the model directly
-                chain = condense_prompt | model | StrOutputParser()
-                standalone_query = chain.invoke({"chat_history": langchain_history, "input": user_query})
-
-            # Step B: Perform Similarity Search
-            docs = vector_store.similarity_search(standalone_query, k=5)
-            context = "\n\n".join(doc.page_content for doc in docs)
-
-            return context, standalone_query
-        except Exception as e:
-            print(f"❌ Chat Sync Error: {e}")
-            return "", user_query
+def _query_overlap(first: str, second: str) -> float:
+    """Word-set Jaccard similarity of two questions."""
+    a, b = set(first.lower().split()), set(second.lower().split())
+    return len(a & b) / len(a | b) if a | b else 1.0
 
-    # 2. Run the DB/Context work in a thread
-    context, final_query = await asyncio.to_thread(get_context_and_standalone_query_sync)
 
-    if not context:
-        return "I'm sorry, I couldn't find any relevant information in the uploaded documents to answer that."
+def _merge_results(primary: list, secondary: list) -> list:
+    """Primary results first, then secondary ones not already present."""
+    seen = {doc.page_content for doc, _ in primary}
+    return list(primary) + [(doc, score) for doc, score in secondary if doc.page_content not in seen]
 
-    # --- FINAL GENERATION ---
-    # 3. Use the LLM to generate the final answer with the retrieved context
+
+async def _retrieve_chat_context(
+        pathway_id: uuid.UUID,
+        user_query: str,
+        langchain_history: list,
+        collection_version: Optional[int],
+) -> Tuple[List[Document], str]:
+    """
+    Contextualizes the question and retrieves, all on the event loop.
+    Returns (docs, standalone query).
+
+    With history, retrieval on the raw question starts speculatively while the
+    LLM condenses it. If the standalone question is close to the raw one
+    (SPECULATIVE_REQUERY_OVERLAP), those results are used as they are;
+    otherwise the standalone question is searched too and its results lead.
+    If the speculative search fails, the standalone question is searched alone.
+    """
+    vector_store = get_vector_store(pathway_id, query_embedding_function)
+
+    async def retrieve(query: str) -> list:
+        # Hybrid search also matches exact terms the embedding misses
+        if HYBRID_RETRIEVAL:
+            return await vector_store.ahybrid_search_with_score(query, k=5, version=collection_version)
+        return await vector_store.asimilarity_search_with_score(query, k=5, version=collection_version)
+
+    speculative = None
+    try:
+        final_query = user_query
+        if langchain_history:
+            speculative = asyncio.create_task(retrieve(user_query))
+
+            # Contextualize the question (handle "it", "they", etc.)
+            condense_prompt = ChatPromptTemplate.from_messages([
+                ("system",
+                 "Given the chat history and a follow-up question, rephrase the follow-up to be a standalone question."),
+                MessagesPlaceholder("chat_history"),
+                ("human", "{input}")
+            ])
+            chain = condense_prompt | model | StrOutputParser()
+            final_query = await llm_gateway.ainvoke(
+                chain, {"chat_history": langchain_history, "input": user_query}, operation="condense"
+            )
+
+            try:
+                raw_results = await speculative
+            except Exception as e:
+                # Only the shortcut is lost; the standalone question is still searched below
+                print(f"⚠️ Speculative retrieval failed, retrieving on the standalone question: {e}")
+                raw_results = None
+
+            if raw_results is not None and _query_overlap(user_query, final_query) >= SPECULATIVE_REQUERY_OVERLAP:
+                results = raw_results
+            else:
+                results = _merge_results(await retrieve(final_query), raw_results or [])
+        else:
+            results = await retrieve(user_query)
+
+        # Hybrid results carry cosine distances too, so weak matches are cut either way
+        docs = optimize_context(results)
+        return docs, final_query
+    except LLMUnavailableError:
+        # Out of quota is the caller's error to report, not an empty context
+        raise
+    except Exception as e:
+        print(f"❌ Chat Retrieval Error: {e}")
+        return [], user_query
+    finally:
+        if speculative and not speculative.done():
+            speculative.cancel()
+
+
+def _qa_chain():
     qa_prompt = ChatPromptTemplate.from_messages([
         ("system",
          "You are a helpful study assistant. Answer the question ONLY using the provided context. If the answer isn't in the context, say you don't know.\n\nContext:\n{context}"),
         MessagesPlaceholder("chat_history"),
         ("human", "{input}")
     ])
+    return qa_prompt | model | StrOutputParser()
+
 
-    rag_chain = qa_prompt | model | StrOutputParser()
+def _chat_sources(docs: List[Document]) -> List[dict]:
+    return [{"document": d.metadata.get("source"), "page": d.metadata.get("page")} for d in docs]
 
-    return await rag_chain.ainvoke({
+
+async def _cached_answer(
+        pathway_id: uuid.UUID,
+        user_query: str,
+        chat_history: List[ChatMessage],
+        collection_version: Optional[int],
+) -> Tuple[Optional[dict], Optional[List[float]]]:
+    """
+    Semantic answer cache lookup for first-turn questions. Returns the cached
+    entry (or None) and the question vector to store the new answer under;
+    the vector is None when the question may not be cached.
+    """
+    if not ANSWER_CACHE_ENABLED or chat_history or collection_version is None:
+        return None, None
+    try:
+        # Goes through the query embedding cache, so retrieval reuses this vector
+        vector = await query_embedding_function.aembed_query(user_query)
+    except Exception as e:
+        print(f"⚠️ Answer cache lookup skipped: {e}")
+        return None, None
+    return answer_cache.get(pathway_id, collection_version, vector), vector
+
+
+async def chat_with_pathway_pdfs(
+        pathway_id: uuid.UUID,
+        user_query: str,
+        chat_history: List[ChatMessage] = [],
+        collection_version: Optional[int] = None,
+) -> str:
+    # 1. A first-turn question close enough to an earlier one reuses its answer
+    cached, question_vector = await _cached_answer(pathway_id, user_query, chat_history, collection_version)
+    if cached:
+        return cached["answer"]
+
+    # 2. Convert the history and retrieve context for the standalone question
+    langchain_history = _to_langchain_history(chat_history)
+    docs, final_query = await _retrieve_chat_context(pathway_id, user_query, langchain_history, collection_version)
+    context = join_context(docs)
+
+    if not context:
+        return NO_CONTEXT_ANSWER
+
+    # --- FINAL GENERATION ---
+    # 3. Use the LLM to generate the final answer with the retrieved context
+    answer = await llm_gateway.ainvoke(_qa_chain(), {
         "context": context,
         "chat_history": langchain_history,
         "input": final_query
-    })
\ No newline at end of file
+    }, operation="chat")
+
+    if question_vector is not None:
+        answer_cache.put(pathway_id, collection_version, question_vector, user_query, answer, _chat_sources(docs))
+    return answer
+
+
+async def stream_chat_with_pathway_pdfs(
+        pathway_id: uuid.UUID,
+        user_query: str,
+        chat_history: List[ChatMessage] = [],
+        collection_version: Optional[int] = None,
+) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    Same answer as chat_with_pathway_pdfs, yielded as (event, data) pairs:
+    a "token" event per generated chunk, then one "done" event with the
+    sources, the standalone query and timings, or an "error" event. An answer
+    from the semantic cache arrives as a single token event.
+    """
+    started_at = time.monotonic()
+    cached, question_vector = await _cached_answer(pathway_id, user_query, chat_history, collection_version)
+    if cached:
+        elapsed_ms = round((time.monotonic() - started_at) * 1000)
+        yield "token", {"content": cached["answer"]}
+        yield "done", {"sources": cached["sources"], "standalone_query": user_query, "cached": True,
+                       "retrieval_ms": elapsed_ms, "time_to_first_token_ms": elapsed_ms, "elapsed_ms": elapsed_ms}
+        return
+
+    langchain_history = _to_langchain_history(chat_history)
+    try:
+        docs, final_query = await _retrieve_chat_context(pathway_id, user_query, langchain_history, collection_version)
+    except LLMUnavailableError as e:
+        yield "error", {"detail": str(e), "retry_after": e.retry_after}
+        return
+    context = join_context(docs)
+    retrieval_ms = round((time.monotonic() - started_at) * 1000)
+
+    sources = _chat_sources(docs)
+    if not context:
+        yield "token", {"content": NO_CONTEXT_ANSWER}
+        yield "done", {"sources": [], "standalone_query": final_query, "cached": False, "retrieval_ms": retrieval_ms,
+                       "time_to_first_token_ms": retrieval_ms, "elapsed_ms": retrieval_ms}
+        return
+
+    first_token_ms = None
+    answer_parts = []
+    try:
+        inputs = {"context": context, "chat_history": langchain_history, "input": final_query}
+        async with aclosing(llm_gateway.astream(_qa_chain(), inputs, operation="chat_stream")) as tokens:
+            async for token in tokens:
+                if not token:
+                    continue
+                if first_token_ms is None:
+                    first_token_ms = round((time.monotonic() - started_at) * 1000)
+                answer_parts.append(token)
+                yield "token", {"content": token}
+    except Exception as e:
+        print(f"🚨 Chat stream failed: {e}")
+        yield "error", {"detail": f"An error occurred while generating the answer: {str(e)}"}
+        return
+
+    # Only a completed answer is cached; an interrupted stream never gets here
+    if question_vector is not None:
+        answer_cache.put(pathway_id, collection_version, question_vector, user_query, "".join(answer_parts), sources)
+
+    yield "done", {
+        "sources": sources,
+        "standalone_query": final_query,
+        "cached": False,
+        "retrieval_ms": retrieval_ms,
+        "time_to_first_token_ms": first_token_ms,
+        "elapsed_ms": round((time.monotonic() - started_at) * 1000),
+    }
@@ -0,0 +1,73 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from sqlalchemy import inspect
+from langchain_core.documents import Document
+
+# ---------------- CONFIG ----------------
+
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "4096"))
+
+Results = List[Tuple[Document, float]]
+
+
+class RetrievalCache:
+    """
+    LRU of similarity-search results keyed by (pathway, collection version,
+    query, k, search parameters). Ingestion and document removal bump the
+    pathway's collection_version, so entries for the old version are never
+    looked up again and simply age out; no explicit invalidation is needed.
+    """
+
+    def __init__(self, max_size: int = RETRIEVAL_CACHE_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Results]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "evicted": 0}
+
+    def get(self, key: Hashable) -> Optional[Results]:
+        with self._lock:
+            results = self._entries.get(key)
+            if results is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return list(results)
+
+    def put(self, key: Hashable, results: Results):
+        with self._lock:
+            self._entries[key] = list(results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats["evicted"] += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+retrieval_cache = RetrievalCache()
+
+
+def text_key(query: str) -> str:
+    return "q:" + " ".join(query.lower().split())
+
+
+def vector_key(vector) -> str:
+    return "v:" + hashlib.sha1(repr([round(float(v), 5) for v in vector]).encode("ascii")).hexdigest()
+
+
+def collection_version_of(topic) -> Optional[int]:
+    """The topic's pathway version if the pathway is already loaded; None bypasses the cache."""
+    if "pathway" in inspect(topic).unloaded or topic.pathway is None:
+        return None
+    return topic.pathway.collection_version
@@ -0,0 +1,118 @@
+import uuid
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import selectinload
+from langchain_core.documents import Document
+
+from core.db import get_session_context
+from models import Pathway, Topic
+from services.embedding_service import EMBEDDING_MODEL, get_query_embedding_function
+from services.vector_store import get_vector_store
+
+# Chunks retrieved per topic by the summary and quiz paths
+SUMMARY_CONTEXT_K = 5
+QUIZ_CONTEXT_K = 4
+
+
+def topic_query_text(topic) -> str:
+    """The retrieval string shared by summaries and quizzes."""
+    return f"{topic.name} {' '.join(topic.keywords or [])}"
+
+
+async def embed_topics(topics: Sequence[Topic]):
+    """
+    Fills in query_embedding for new topics with one batched embedding call.
+    The caller commits. A provider failure only logs: the vectors are filled
+    in lazily by topic_query_vector instead.
+    """
+    if not topics:
+        return
+    try:
+        vectors = await get_query_embedding_function().aembed_documents([topic_query_text(t) for t in topics])
+    except Exception as e:
+        print(f"⚠️ Topic embedding deferred: {e}")
+        return
+    for topic, vector in zip(topics, vectors):
+        topic.query_embedding = vector
+        topic.query_embedding_model = EMBEDDING_MODEL
+
+
+def _has_current_vector(topic: Topic) -> bool:
+    return topic.query_embedding is not None and topic.query_embedding_model == EMBEDDING_MODEL
+
+
+async def _store_vectors(vectors: Dict[int, List[float]]):
+    try:
+        async with get_session_context() as db:
+            for topic_id, vector in vectors.items():
+                await db.execute(
+                    update(Topic)
+                    .where(Topic.id == topic_id)
+                    .values(query_embedding=vector, query_embedding_model=EMBEDDING_MODEL)
+                )
+            await db.commit()
+    except Exception as e:
+        print(f"⚠️ Could not store query embeddings for topics {list(vectors)}: {e}")
+
+
+async def topic_query_vector(topic: Topic) -> List[float]:
+    """
+    Returns the topic's stored retrieval vector. Topics created before vectors
+    were stored, or embedded with another model, are embedded once and saved.
+    """
+    if _has_current_vector(topic):
+        return [float(v) for v in topic.query_embedding]
+
+    vector = await get_query_embedding_function().aembed_query(topic_query_text(topic))
+    await _store_vectors({topic.id: vector})
+    return vector
+
+
+async def topic_query_vectors(topics: Sequence[Topic]) -> Dict[int, List[float]]:
+    """Like topic_query_vector for many topics, with at most one embedding call for the missing ones."""
+    vectors = {t.id: [float(v) for v in t.query_embedding] for t in topics if _has_current_vector(t)}
+    missing = [t for t in topics if t.id not in vectors]
+    if missing:
+        fresh = await get_query_embedding_function().aembed_documents([topic_query_text(t) for t in missing])
+        fresh_by_id = {t.id: vector for t, vector in zip(missing, fresh)}
+        await _store_vectors(fresh_by_id)
+        vectors.update(fresh_by_id)
+    return vectors
+
+
+async def retrieve_for_topics(
+        pathway_id: uuid.UUID,
+        topics: Sequence[Topic],
+        version: Optional[int] = None,
+        ks: Sequence[int] = (SUMMARY_CONTEXT_K, QUIZ_CONTEXT_K),
+) -> Dict[int, List[Tuple[Document, float]]]:
+    """
+    Retrieves the top max(ks) chunks for every topic of a pathway with one
+    embedding call (none once topic vectors are stored) and one LATERAL SQL
+    query. Returns topic_id -> (chunk, cosine distance) pairs. With a collection version, the answers
+    are also cached under each k in `ks`, so the per-topic summary and quiz
+    searches that follow are served from memory.
+    """
+    vectors = await topic_query_vectors(topics)
+    topic_ids = [t.id for t in topics]
+    results = await get_vector_store(pathway_id).asimilarity_search_many_by_vector(
+        [vectors[topic_id] for topic_id in topic_ids], k=max(ks), version=version, prefix_ks=ks
+    )
+    return dict(zip(topic_ids, results))
+
+
+async def prepare_pathway_context(pathway_id: uuid.UUID) -> Dict[int, List[Tuple[Document, float]]]:
+    """
+    Loads a pathway's topics and retrieves context for all of them at once
+    (see retrieve_for_topics). The ingestion worker runs it once per completed
+    job, which stores the topic vectors; POST /pathways/{id}/prepare runs it
+    in an API process to warm that process's retrieval cache.
+    """
+    async with get_session_context() as db:
+        pathway = (await db.execute(
+            select(Pathway).where(Pathway.id == pathway_id).options(selectinload(Pathway.topics))
+        )).scalar_one_or_none()
+        if not pathway or not pathway.topics:
+            return {}
+        return await retrieve_for_topics(pathway_id, pathway.topics, version=pathway.collection_version)
@@ -0,0 +1,122 @@
+import os
+import hashlib
+import tempfile
+from typing import BinaryIO, List
+
+from pypdf import PasswordType, PdfReader
+
+# ---------------- CONFIG ----------------
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+MAX_TOTAL_UPLOAD_BYTES = int(os.getenv("MAX_TOTAL_UPLOAD_BYTES", str(120 * 1024 * 1024)))
+MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", "1000"))
+# Uploads stay in memory up to this size, then roll over to a temp file on disk
+SPOOL_MEMORY_BYTES = int(os.getenv("UPLOAD_SPOOL_MEMORY_BYTES", str(1024 * 1024)))
+READ_BLOCK_BYTES = 1024 * 1024
+
+PDF_MAGIC = b"%PDF-"
+
+
+class UploadRejected(ValueError):
+    """Raised when an upload fails validation; `status_code` is the HTTP status to return."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class SpooledUpload:
+    """A size-capped, already-hashed upload backed by a SpooledTemporaryFile."""
+
+    def __init__(self, filename: str, file: BinaryIO, size: int, file_hash: str, page_count: int = 0):
+        self.filename = filename
+        self.file = file
+        self.size = size
+        self.file_hash = file_hash
+        self.page_count = page_count
+
+    def close(self):
+        self.file.close()
+
+
+async def spool_upload(upload, max_bytes: int = MAX_UPLOAD_BYTES) -> SpooledUpload:
+    """
+    Copies a FastAPI UploadFile into a capped spooled file block by block,
+    hashing as it goes. Aborts as soon as the cap is crossed or the first
+    bytes are not a PDF header, so oversized or bogus files are never fully read.
+    """
+    declared_size = getattr(upload, "size", None)
+    if declared_size is not None and declared_size > max_bytes:
+        raise UploadRejected(f"{upload.filename} is larger than {max_bytes // (1024 * 1024)} MB.", 413)
+
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            block = await upload.read(READ_BLOCK_BYTES)
+            if not block:
+                break
+            if size == 0 and PDF_MAGIC not in block[:1024]:
+                raise UploadRejected(f"{upload.filename} is not a PDF file.")
+            size += len(block)
+            if size > max_bytes:
+                raise UploadRejected(f"{upload.filename} is larger than {max_bytes // (1024 * 1024)} MB.", 413)
+            digest.update(block)
+            spool.write(block)
+    except BaseException:
+        spool.close()
+        raise
+
+    if size == 0:
+        spool.close()
+        raise UploadRejected(f"{upload.filename} is empty.")
+
+    return SpooledUpload(upload.filename, spool, size, digest.hexdigest())
+
+
+def validate_pdf(upload: SpooledUpload, max_pages: int = MAX_PDF_PAGES):
+    """
+    Opens the PDF structure only (no text extraction) to check encryption and
+    page count. PDFs locked with only an owner password open with an empty
+    user password and are accepted; only those that need a password to read
+    are rejected.
+    """
+    upload.file.seek(0)
+    try:
+        reader = PdfReader(upload.file)
+        if reader.is_encrypted and reader.decrypt("") == PasswordType.NOT_DECRYPTED:
+            raise UploadRejected(f"{upload.filename} is password protected.")
+        page_count = len(reader.pages)
+    except UploadRejected:
+        raise
+    except Exception:
+        # Malformed files fail in many ways inside pypdf (PdfReadError, KeyError, ValueError, ...)
+        raise UploadRejected(f"{upload.filename} is not a readable PDF.")
+
+    if page_count == 0:
+        raise UploadRejected(f"{upload.filename} has no pages.")
+    if page_count > max_pages:
+        raise UploadRejected(f"{upload.filename} has {page_count} pages; the limit is {max_pages}.", 413)
+    upload.page_count = page_count
+
+
+async def receive_pdf_uploads(uploads) -> List[SpooledUpload]:
+    """Spools and validates every file before anything is queued; closes all spools on rejection."""
+    received: List[SpooledUpload] = []
+    try:
+        total = 0
+        for upload in uploads:
+            spooled = await spool_upload(upload)
+            received.append(spooled)
+            total += spooled.size
+            if total > MAX_TOTAL_UPLOAD_BYTES:
+                raise UploadRejected(
+                    f"Uploads exceed {MAX_TOTAL_UPLOAD_BYTES // (1024 * 1024)} MB in total.", 413
+                )
+            validate_pdf(spooled)
+    except BaseException:
+        for spooled in received:
+            spooled.close()
+        raise
+    return received
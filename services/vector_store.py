@@ -0,0 +1,804 @@
+import os
+import re
+import json
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from services.retrieval_cache import retrieval_cache, text_key, vector_key
+from services.hot_index import HOT_INDEX_ENABLED, hot_indexes
+
+load_dotenv()
+
+VECTOR_DB_URL = os.getenv("VECTOR_DB_URL")
+
+# One pool per process for ingestion writes, the embedding cache and retrieval
+VECTOR_POOL_SIZE = int(os.getenv("VECTOR_POOL_SIZE", "5"))
+VECTOR_POOL_MAX_OVERFLOW = int(os.getenv("VECTOR_POOL_MAX_OVERFLOW", "10"))
+VECTOR_POOL_TIMEOUT = float(os.getenv("VECTOR_POOL_TIMEOUT", "10"))
+VECTOR_POOL_RECYCLE = int(os.getenv("VECTOR_POOL_RECYCLE", "1800"))
+# Pathway handles kept in the registry before the least recently used is dropped
+VECTOR_STORE_REGISTRY_SIZE = int(os.getenv("VECTOR_STORE_REGISTRY_SIZE", "256"))
+
+# ANN index over document_chunks.embedding. Vectors are stored unit-length, so
+# the index uses inner product (vector_ip_ops) and 1 + (a <#> b) equals the
+# cosine distance callers expect.
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "hnsw").lower()  # "hnsw" | "ivfflat"
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "40"))
+IVFFLAT_PROBES = int(os.getenv("IVFFLAT_PROBES", "10"))
+# The HNSW index is shared by all pathways, so a plain index scan finds the
+# ef_search nearest rows of the whole table and only then applies the pathway
+# filter. Iterative scans ("relaxed_order" / "strict_order") keep scanning
+# until k rows survive the filter. They need pgvector >= 0.8: the setting is
+# applied only once the installed extversion is checked, and searches that
+# come back short are re-run exactly either way.
+HNSW_ITERATIVE_SCAN = os.getenv("HNSW_ITERATIVE_SCAN", "")
+# Hybrid retrieval: full-text leg over the generated content_tsv column, fused
+# with the vector leg by reciprocal-rank fusion. The text search config must
+# match the generated column (migration 011).
+TEXT_SEARCH_CONFIG = "english"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+VECTOR_INDEX_NAMES = {
+    "hnsw": "ix_document_chunks_embedding_hnsw",
+    "ivfflat": "ix_document_chunks_embedding_ivfflat",
+}
+
+# Columns written by the bulk writer, in COPY order, with their Postgres types
+CHUNK_COLUMNS = (
+    ("pathway_id", "uuid"),
+    ("document_id", "uuid"),
+    ("content", "text"),
+    ("embedding", "vector"),
+    ("source", "text"),
+    ("page", "int4"),
+    ("chunk_index", "int4"),
+    ("file_hash", "text"),
+    ("embedding_model", "text"),
+    ("cmetadata", "jsonb"),
+)
+
+
+def sync_url(url: str = VECTOR_DB_URL) -> str:
+    """Normalizes VECTOR_DB_URL to the psycopg (v3) driver, which supports binary COPY."""
+    for prefix in ("postgresql+asyncpg", "postgresql+psycopg2", "postgresql+psycopg", "postgres"):
+        if url.startswith(prefix + "://"):
+            return "postgresql+psycopg://" + url[len(prefix) + 3:]
+    if url.startswith("postgresql://"):
+        return "postgresql+psycopg://" + url[len("postgresql://"):]
+    return url
+
+
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+_pool_events = {"connects": 0, "checkouts": 0, "invalidated": 0}
+
+
+def _count_pool_event(name: str):
+    def listener(*args):
+        _pool_events[name] += 1
+    return listener
+
+
+def get_engine() -> Engine:
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_engine(
+                sync_url(),
+                pool_size=VECTOR_POOL_SIZE,
+                max_overflow=VECTOR_POOL_MAX_OVERFLOW,
+                pool_timeout=VECTOR_POOL_TIMEOUT,
+                pool_recycle=VECTOR_POOL_RECYCLE,
+                pool_pre_ping=True,
+            )
+            event.listen(_engine, "connect", _count_pool_event("connects"))
+            event.listen(_engine, "checkout", _count_pool_event("checkouts"))
+            event.listen(_engine, "invalidate", _count_pool_event("invalidated"))
+        return _engine
+
+
+def pool_stats() -> Dict[str, int]:
+    """Live pool gauges plus lifetime counters; `connects` far above `size` means churn."""
+    engine = get_engine()
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "max_overflow": VECTOR_POOL_MAX_OVERFLOW,
+        **_pool_events,
+        "registered_stores": len(_stores),
+    }
+
+
+def dispose_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+    with _stores_lock:
+        _stores.clear()
+
+
+def normalize_vector(vector: Sequence[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm > 0 else array
+
+
+def _vector_literal(vector: Sequence[float]) -> str:
+    return "[" + ",".join(repr(float(v)) for v in vector) + "]"
+
+
+# ---------------------------------------------------------
+# BULK WRITES
+# ---------------------------------------------------------
+
+class BulkChunkWriter:
+    """
+    Streams chunk rows into document_chunks with binary COPY on one connection.
+
+    Rows are COPYed into a temp staging table and inserted with ON CONFLICT
+    DO NOTHING on (document_id, page, chunk_index), so writing a chunk that is
+    already stored is a no-op. `commit()` makes everything written so far
+    durable; the `with` block commits on a clean exit and rolls back the
+    uncommitted tail otherwise. COPY is not thread-safe on a connection, so
+    all writes must come from the thread that owns the writer.
+    """
+
+    def __init__(self, pathway_id: uuid.UUID, engine: Optional[Engine] = None):
+        self.pathway_id = pathway_id
+        self.engine = engine or get_engine()
+        self.rows_written = 0
+        self._pooled = None
+        self._conn = None
+
+    def __enter__(self) -> "BulkChunkWriter":
+        from pgvector.psycopg import register_vector
+
+        self._pooled = self.engine.raw_connection()
+        self._conn = self._pooled.driver_connection
+        register_vector(self._conn)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._conn.commit()
+            else:
+                self._conn.rollback()
+        finally:
+            self._pooled.close()
+        return False
+
+    def commit(self):
+        self._conn.commit()
+
+    def write(
+            self,
+            texts: Sequence[str],
+            vectors: Sequence[Sequence[float]],
+            metadatas: Sequence[dict],
+    ) -> int:
+        """Writes the rows and returns how many were new."""
+        from psycopg.types.json import Jsonb
+
+        columns = ", ".join(name for name, _ in CHUNK_COLUMNS)
+        with self._conn.cursor() as cursor:
+            # Created per transaction, so a pooled connection never carries stale rows
+            cursor.execute(
+                f"CREATE TEMP TABLE IF NOT EXISTS chunk_staging ON COMMIT DROP AS "
+                f"SELECT {columns} FROM document_chunks WITH NO DATA"
+            )
+            with cursor.copy(f"COPY chunk_staging ({columns}) FROM STDIN WITH (FORMAT BINARY)") as copy:
+                copy.set_types([pg_type for _, pg_type in CHUNK_COLUMNS])
+                for content, vector, metadata in zip(texts, vectors, metadatas):
+                    document_id = metadata.get("document_id")
+                    copy.write_row((
+                        self.pathway_id,
+                        uuid.UUID(document_id) if document_id else None,
+                        content,
+                        normalize_vector(vector),
+                        metadata.get("source"),
+                        metadata.get("page"),
+                        metadata.get("chunk_index"),
+                        metadata.get("file_hash"),
+                        metadata.get("embedding_model"),
+                        Jsonb(metadata),
+                    ))
+            cursor.execute(
+                f"INSERT INTO document_chunks ({columns}) SELECT {columns} FROM chunk_staging "
+                f"ON CONFLICT (document_id, page, chunk_index) DO NOTHING"
+            )
+            inserted = cursor.rowcount
+            cursor.execute("TRUNCATE chunk_staging")
+        self.rows_written += inserted
+        return inserted
+
+    def write_documents(self, documents: Sequence[Document], vectors: Sequence[Sequence[float]]) -> int:
+        return self.write([d.page_content for d in documents], vectors, [d.metadata for d in documents])
+
+
+def stored_chunk_keys(document_ids: Sequence[uuid.UUID]) -> Set[Tuple[str, int, int]]:
+    """(document_id, page, chunk_index) of every chunk already stored for the documents."""
+    if not document_ids:
+        return set()
+    with get_engine().connect() as conn:
+        rows = conn.execute(text("""
+            SELECT document_id, page, chunk_index
+            FROM document_chunks
+            WHERE document_id = ANY(:document_ids)
+        """), {"document_ids": list(document_ids)}).all()
+    return {(str(document_id), page, chunk_index) for document_id, page, chunk_index in rows}
+
+
+# ---------------------------------------------------------
+# RETRIEVAL
+# ---------------------------------------------------------
+
+# relaxed_order may return rows slightly out of order, hence the outer sort
+_SEARCH_SQL = """
+    SELECT content, cmetadata, source, page, distance
+    FROM (
+        SELECT content, cmetadata, source, page,
+               1 + (embedding <#> CAST(CAST(:embedding AS text) AS vector)) AS distance
+        FROM document_chunks
+        WHERE pathway_id = :pathway_id
+        ORDER BY embedding <#> CAST(CAST(:embedding AS text) AS vector)
+        LIMIT :k
+    ) nearest
+    ORDER BY distance
+"""
+
+
+_HYBRID_SQL = f"""
+    WITH vector_leg AS (
+        SELECT id, row_number() OVER (ORDER BY distance) AS rank
+        FROM (
+            SELECT id, embedding <#> CAST(CAST(:embedding AS text) AS vector) AS distance
+            FROM document_chunks
+            WHERE pathway_id = :pathway_id
+            ORDER BY embedding <#> CAST(CAST(:embedding AS text) AS vector)
+            LIMIT :candidates
+        ) nearest
+    ),
+    text_leg AS (
+        SELECT c.id, row_number() OVER (ORDER BY ts_rank_cd(c.content_tsv, q) DESC) AS rank
+        FROM document_chunks c, websearch_to_tsquery('{TEXT_SEARCH_CONFIG}', :query) q
+        WHERE c.pathway_id = :pathway_id AND c.content_tsv @@ q
+        ORDER BY rank
+        LIMIT :candidates
+    ),
+    fused AS (
+        SELECT id, sum(1.0 / (:rrf_k + rank)) AS score
+        FROM (SELECT * FROM vector_leg UNION ALL SELECT * FROM text_leg) ranked
+        GROUP BY id
+        ORDER BY score DESC
+        LIMIT :k
+    )
+    SELECT c.content, c.cmetadata, c.source, c.page,
+           1 + (c.embedding <#> CAST(CAST(:embedding AS text) AS vector)) AS distance,
+           f.score, (SELECT count(*) FROM vector_leg) AS vector_hits
+    FROM fused f
+    JOIN document_chunks c ON c.id = f.id
+    ORDER BY f.score DESC
+"""
+
+
+# Text leg alone, for hybrid search whose vector leg is served by the hot index
+_TEXT_SEARCH_SQL = f"""
+    SELECT c.id
+    FROM document_chunks c, websearch_to_tsquery('{TEXT_SEARCH_CONFIG}', :query) q
+    WHERE c.pathway_id = :pathway_id AND c.content_tsv @@ q
+    ORDER BY ts_rank_cd(c.content_tsv, q) DESC
+    LIMIT :candidates
+"""
+
+
+# One top-k per query vector in a single statement; each LATERAL probe can use the ANN index
+_BATCH_SEARCH_SQL = """
+    SELECT q.ord, c.content, c.cmetadata, c.source, c.page, c.distance
+    FROM unnest(CAST(:embeddings AS text[])) WITH ORDINALITY AS q(query_vector, ord)
+    CROSS JOIN LATERAL (
+        SELECT d.content, d.cmetadata, d.source, d.page,
+               1 + (d.embedding <#> CAST(q.query_vector AS vector)) AS distance
+        FROM document_chunks d
+        WHERE d.pathway_id = :pathway_id
+        ORDER BY d.embedding <#> CAST(q.query_vector AS vector)
+        LIMIT :k
+    ) c
+    ORDER BY q.ord, c.distance
+"""
+
+# Fallback for short results: without plain index scans the planner filters
+# by pathway first and sorts that pathway's rows exactly
+_EXACT_SCAN_SQL = "SELECT set_config('enable_indexscan', 'off', true)"
+
+
+_EXTVERSION_SQL = "SELECT extversion FROM pg_extension WHERE extname = 'vector'"
+# Whether HNSW_ITERATIVE_SCAN can be applied; checked on the first search
+_iterative_scan_supported: Optional[bool] = None
+
+
+def _check_iterative_scan(extversion: Optional[str]) -> bool:
+    global _iterative_scan_supported
+    version = tuple(int(part) for part in re.findall(r"\d+", extversion or "")[:2])
+    _iterative_scan_supported = version >= (0, 8)
+    if not _iterative_scan_supported:
+        # Older pgvector rejects the unknown setting, which would fail every search
+        print(f"⚠️ HNSW_ITERATIVE_SCAN ignored: pgvector {extversion or '(not installed)'} is older than 0.8.")
+    return _iterative_scan_supported
+
+
+def _iterative_scan_enabled(conn) -> bool:
+    if not HNSW_ITERATIVE_SCAN:
+        return False
+    if _iterative_scan_supported is None:
+        return _check_iterative_scan(conn.execute(text(_EXTVERSION_SQL)).scalar())
+    return _iterative_scan_supported
+
+
+async def _aiterative_scan_enabled(conn) -> bool:
+    if not HNSW_ITERATIVE_SCAN:
+        return False
+    if _iterative_scan_supported is None:
+        return _check_iterative_scan((await conn.execute(text(_EXTVERSION_SQL))).scalar())
+    return _iterative_scan_supported
+
+
+def _tuning_sql(iterative_scan: bool) -> str:
+    # set_config(..., true) is scoped to the current transaction, i.e. this query
+    settings = ["set_config('hnsw.ef_search', :ef_search, true)", "set_config('ivfflat.probes', :probes, true)"]
+    if iterative_scan:
+        settings.append("set_config('hnsw.iterative_scan', :iterative_scan, true)")
+    return "SELECT " + ", ".join(settings)
+
+
+def _tuning_params(k: int, ef_search: Optional[int], probes: Optional[int]) -> dict:
+    return {
+        # ef_search below k would cap the result count
+        "ef_search": str(max(ef_search or HNSW_EF_SEARCH, k)),
+        "probes": str(probes or IVFFLAT_PROBES),
+        "iterative_scan": HNSW_ITERATIVE_SCAN,
+    }
+
+
+def _tune(conn, k: int, ef_search: Optional[int] = None, probes: Optional[int] = None):
+    conn.execute(text(_tuning_sql(_iterative_scan_enabled(conn))), _tuning_params(k, ef_search, probes))
+
+
+async def _atune(conn, k: int, ef_search: Optional[int] = None, probes: Optional[int] = None):
+    iterative_scan = await _aiterative_scan_enabled(conn)
+    await conn.execute(text(_tuning_sql(iterative_scan)), _tuning_params(k, ef_search, probes))
+
+
+def _to_hybrid_results(rows) -> List[Tuple[Document, float]]:
+    """(chunk, cosine distance) in fused order; the RRF score goes into the metadata."""
+    results = _to_results(row[:5] for row in rows)
+    for (doc, _), row in zip(results, rows):
+        doc.metadata["rrf_score"] = float(row[5])
+    return results
+
+
+def _to_results(rows) -> List[Tuple[Document, float]]:
+    results = []
+    for content, metadata, source, page, distance in rows:
+        # asyncpg hands back jsonb as text unless a codec is registered
+        metadata = dict(json.loads(metadata) if isinstance(metadata, str) else metadata or {})
+        metadata.setdefault("source", source)
+        metadata.setdefault("page", page)
+        results.append((Document(page_content=content, metadata=metadata), float(distance)))
+    return results
+
+
+class PathwayVectorStore:
+    """
+    Similarity search over one pathway's rows in document_chunks (cosine distance).
+
+    The sync methods use the pooled psycopg engine; the `a`-prefixed methods run
+    the same query on the asyncpg engine from core/db.py, so request handlers
+    can retrieve without borrowing a thread. With HOT_INDEX_ENABLED, async
+    vector searches that carry a collection version, and the vector leg of
+    hybrid searches, are served from the in-memory index in
+    services/hot_index.py instead.
+    """
+
+    def __init__(self, pathway_id: uuid.UUID, embeddings: Embeddings, engine: Optional[Engine] = None):
+        self.pathway_id = pathway_id
+        self.embeddings = embeddings
+        self.engine = engine or get_engine()
+
+    def _params(self, vector: Sequence[float], k: int) -> dict:
+        return {"embedding": _vector_literal(normalize_vector(vector)), "pathway_id": self.pathway_id, "k": k}
+
+    def _cache_key(self, query_key: str, k: int, ef_search, probes, version: Optional[int]):
+        # Without a collection version there is nothing to invalidate on, so no caching
+        if version is None:
+            return None
+        return self.pathway_id, version, query_key, k, ef_search, probes
+
+    def similarity_search_with_score_by_vector(
+            self,
+            vector: Sequence[float],
+            k: int = 4,
+            ef_search: Optional[int] = None,
+            probes: Optional[int] = None,
+            version: Optional[int] = None,
+    ) -> List[Tuple[Document, float]]:
+        key = self._cache_key(vector_key(vector), k, ef_search, probes, version)
+        cached = retrieval_cache.get(key) if key else None
+        if cached is not None:
+            return cached
+
+        with self.engine.connect() as conn:
+            _tune(conn, k, ef_search, probes)
+            rows = conn.execute(text(_SEARCH_SQL), self._params(vector, k)).all()
+            if len(rows) < k:
+                conn.execute(text(_EXACT_SCAN_SQL))
+                rows = conn.execute(text(_SEARCH_SQL), self._params(vector, k)).all()
+        results = _to_results(rows)
+        if key:
+            retrieval_cache.put(key, results)
+        return results
+
+    def similarity_search_with_score(
+            self,
+            query: str,
+            k: int = 4,
+            version: Optional[int] = None,
+    ) -> List[Tuple[Document, float]]:
+        key = self._cache_key(text_key(query), k, None, None, version)
+        cached = retrieval_cache.get(key) if key else None
+        if cached is not None:
+            return cached
+
+        results = self.similarity_search_with_score_by_vector(self.embeddings.embed_query(query), k)
+        if key:
+            retrieval_cache.put(key, results)
+        return results
+
+    def similarity_search(self, query: str, k: int = 4, version: Optional[int] = None) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, version)]
+
+    async def _asearch_by_vector(
+            self,
+            vector: Sequence[float],
+            k: int,
+            ef_search: Optional[int],
+            probes: Optional[int],
+            version: Optional[int],
+    ) -> List[Tuple[Document, float]]:
+        from core.db import engine as async_engine
+
+        if HOT_INDEX_ENABLED and version is not None:
+            # Exact top-k from the in-memory matrix of this collection version
+            return (await hot_indexes.get(self.pathway_id, version)).search(vector, k)
+
+        async with async_engine.connect() as conn:
+            await _atune(conn, k, ef_search, probes)
+            rows = (await conn.execute(text(_SEARCH_SQL), self._params(vector, k))).all()
+            if len(rows) < k:
+                # The ANN scan lost rows to the pathway filter (or the pathway is small)
+                await conn.execute(text(_EXACT_SCAN_SQL))
+                rows = (await conn.execute(text(_SEARCH_SQL), self._params(vector, k))).all()
+        return _to_results(rows)
+
+    async def asimilarity_search_with_score_by_vector(
+            self,
+            vector: Sequence[float],
+            k: int = 4,
+            ef_search: Optional[int] = None,
+            probes: Optional[int] = None,
+            version: Optional[int] = None,
+    ) -> List[Tuple[Document, float]]:
+        key = self._cache_key(vector_key(vector), k, ef_search, probes, version)
+        cached = retrieval_cache.get(key) if key else None
+        if cached is not None:
+            return cached
+
+        results = await self._asearch_by_vector(vector, k, ef_search, probes, version)
+        if key:
+            retrieval_cache.put(key, results)
+        return results
+
+    async def asimilarity_search_with_score(
+            self,
+            query: str,
+            k: int = 4,
+            version: Optional[int] = None,
+    ) -> List[Tuple[Document, float]]:
+        # A hit on the query text also skips embedding the query
+        key = self._cache_key(text_key(query), k, None, None, version)
+        cached = retrieval_cache.get(key) if key else None
+        if cached is not None:
+            return cached
+
+        vector = await self.embeddings.aembed_query(query)
+        results = await self._asearch_by_vector(vector, k, None, None, version)
+        if key:
+            retrieval_cache.put(key, results)
+        return results
+
+    async def _abatch_search(self, conn, vectors, indexes: List[int], k: int, grouped: dict):
+        """Runs _BATCH_SEARCH_SQL for vectors[i] of each i in `indexes`, replacing grouped[i]."""
+        params = {
+            "embeddings": [_vector_literal(normalize_vector(vectors[i])) for i in indexes],
+            "pathway_id": self.pathway_id,
+            "k": k,
+        }
+        rows = (await conn.execute(text(_BATCH_SEARCH_SQL), params)).all()
+        for i in indexes:
+            grouped[i] = []
+        for ord_, *row in rows:
+            grouped[indexes[ord_ - 1]].append(row)
+
+    async def asimilarity_search_many_by_vector(
+            self,
+            vectors: Sequence[Sequence[float]],
+            k: int = 4,
+            version: Optional[int] = None,
+            prefix_ks: Sequence[int] = (),
+    ) -> List[List[Tuple[Document, float]]]:
+        """
+        Top-k for several query vectors in one round trip, in input order.
+        Each answer is also stored in the retrieval cache, so later single
+        searches for the same vector and k are served from memory; for each
+        smaller k in `prefix_ks` its first k results are cached as well.
+        """
+        from core.db import engine as async_engine
+
+        results: List[Optional[List[Tuple[Document, float]]]] = [None] * len(vectors)
+        keys = [self._cache_key(vector_key(v), k, None, None, version) for v in vectors]
+        pending = []
+        for i, key in enumerate(keys):
+            cached = retrieval_cache.get(key) if key else None
+            if cached is None:
+                pending.append(i)
+            else:
+                results[i] = cached
+
+        if pending and HOT_INDEX_ENABLED and version is not None:
+            index = await hot_indexes.get(self.pathway_id, version)
+            for i in pending:
+                results[i] = index.search(vectors[i], k)
+        elif pending:
+            grouped = {i: [] for i in pending}
+            async with async_engine.connect() as conn:
+                await _atune(conn, k)
+                await self._abatch_search(conn, vectors, pending, k, grouped)
+                short = [i for i in pending if len(grouped[i]) < k]
+                if short:
+                    await conn.execute(text(_EXACT_SCAN_SQL))
+                    await self._abatch_search(conn, vectors, short, k, grouped)
+            for i, group in grouped.items():
+                results[i] = _to_results(group)
+
+        for i in pending:
+            if keys[i]:
+                retrieval_cache.put(keys[i], results[i])
+                for prefix_k in prefix_ks:
+                    if prefix_k < k:
+                        prefix_key = self._cache_key(vector_key(vectors[i]), prefix_k, None, None, version)
+                        retrieval_cache.put(prefix_key, results[i][:prefix_k])
+        return results
+
+    async def asimilarity_search(self, query: str, k: int = 4, version: Optional[int] = None) -> List[Document]:
+        return [doc for doc, _ in await self.asimilarity_search_with_score(query, k, version)]
+
+    async def ahybrid_search_with_score(
+            self,
+            query: str,
+            k: int = 4,
+            version: Optional[int] = None,
+            candidates: int = HYBRID_CANDIDATES,
+    ) -> List[Tuple[Document, float]]:
+        """
+        Vector and full-text top candidates fused by reciprocal rank, in one
+        round trip. Exact terms (formula names, identifiers) that embed poorly
+        still surface through the text leg. Results are in fused order; each
+        carries its cosine distance like the similarity methods, so the same
+        weak-match cut-off applies, and its RRF score as metadata["rrf_score"].
+        """
+        from core.db import engine as async_engine
+
+        key = self._cache_key("h:" + text_key(query), k, candidates, None, version)
+        cached = retrieval_cache.get(key) if key else None
+        if cached is not None:
+            return cached
+
+        vector = await self.embeddings.aembed_query(query)
+        if HOT_INDEX_ENABLED and version is not None:
+            results = await self._ahybrid_hot(query, vector, k, max(candidates, k), version)
+            if key:
+                retrieval_cache.put(key, results)
+            return results
+
+        params = {**self._params(vector, k), "query": query, "candidates": max(candidates, k), "rrf_k": RRF_K}
+        async with async_engine.connect() as conn:
+            await _atune(conn, params["candidates"])
+            rows = (await conn.execute(text(_HYBRID_SQL), params)).all()
+            if not rows or rows[0].vector_hits < params["candidates"]:
+                # Vector leg came back short: rank this pathway's rows exactly
+                await conn.execute(text(_EXACT_SCAN_SQL))
+                rows = (await conn.execute(text(_HYBRID_SQL), params)).all()
+        results = _to_hybrid_results(rows)
+        if key:
+            retrieval_cache.put(key, results)
+        return results
+
+    async def _ahybrid_hot(
+            self,
+            query: str,
+            vector: Sequence[float],
+            k: int,
+            candidates: int,
+            version: int,
+    ) -> List[Tuple[Document, float]]:
+        """ahybrid_search_with_score with the vector leg scored in memory and only the text leg in SQL."""
+        from core.db import engine as async_engine
+
+        index = await hot_indexes.get(self.pathway_id, version)
+        vector_rows = [row for row, _ in index.nearest_rows(vector, candidates)]
+        async with async_engine.connect() as conn:
+            text_ids = (await conn.execute(text(_TEXT_SEARCH_SQL), {
+                "query": query, "pathway_id": self.pathway_id, "candidates": candidates,
+            })).scalars().all()
+        text_rows = [index.row_of_id[i] for i in text_ids if i in index.row_of_id]
+
+        scores: Dict[int, float] = {}
+        for ranked in (vector_rows, text_rows):
+            for rank, row in enumerate(ranked, start=1):
+                scores[row] = scores.get(row, 0.0) + 1.0 / (RRF_K + rank)
+        fused = sorted(scores, key=scores.get, reverse=True)[:k]
+
+        results = []
+        for row, distance in zip(fused, index.distances(vector, fused)):
+            doc = index.document(row)
+            doc.metadata["rrf_score"] = scores[row]
+            results.append((doc, distance))
+        return results
+
+    async def ahybrid_search(self, query: str, k: int = 4, version: Optional[int] = None) -> List[Document]:
+        return [doc for doc, _ in await self.ahybrid_search_with_score(query, k, version)]
+
+
+# ---------------------------------------------------------
+# REGISTRY
+# ---------------------------------------------------------
+
+_stores: "OrderedDict[uuid.UUID, PathwayVectorStore]" = OrderedDict()
+_stores_lock = threading.Lock()
+
+
+def get_vector_store(pathway_id: uuid.UUID, embeddings: Optional[Embeddings] = None) -> PathwayVectorStore:
+    """
+    Returns the process-wide handle for a pathway's collection. Handles share
+    the pooled engine and the configured embedding provider, so a chat message
+    only checks a connection out of the pool instead of building a store.
+    """
+    if embeddings is None:
+        from services.embedding_service import get_query_embedding_function
+        embeddings = get_query_embedding_function()
+
+    with _stores_lock:
+        store = _stores.get(pathway_id)
+        if store is not None and store.embeddings is embeddings:
+            _stores.move_to_end(pathway_id)
+            return store
+
+        store = PathwayVectorStore(pathway_id, embeddings)
+        _stores[pathway_id] = store
+        while len(_stores) > VECTOR_STORE_REGISTRY_SIZE:
+            _stores.popitem(last=False)
+        return store
+
+
+# ---------------------------------------------------------
+# ANN INDEX MANAGEMENT
+# ---------------------------------------------------------
+
+def vector_index_ddl(kind: str = VECTOR_INDEX_TYPE, lists: int = 100) -> str:
+    if kind == "hnsw":
+        options = f"m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION}"
+    elif kind == "ivfflat":
+        options = f"lists = {lists}"
+    else:
+        raise ValueError(f"Unknown vector index type '{kind}' (expected 'hnsw' or 'ivfflat')")
+    return (
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {VECTOR_INDEX_NAMES[kind]} "
+        f"ON document_chunks USING {kind} (embedding vector_ip_ops) WITH ({options})"
+    )
+
+
+def create_vector_index(kind: str = VECTOR_INDEX_TYPE) -> str:
+    """
+    Builds the ANN index without blocking writes. IVFFlat clusters the rows that
+    exist at build time, so it is sized from the current row count (rows / 1000,
+    sqrt(rows) past a million) and should be rebuilt after large loads.
+    A build that failed midway leaves an INVALID index, which is dropped first.
+    """
+    name = VECTOR_INDEX_NAMES.get(kind)
+    if name is None:
+        raise ValueError(f"Unknown vector index type '{kind}' (expected 'hnsw' or 'ivfflat')")
+
+    with get_engine().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        invalid = conn.execute(text("""
+            SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = :name AND NOT i.indisvalid
+        """), {"name": name}).first()
+        if invalid:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+        rows = conn.execute(text("SELECT count(*) FROM document_chunks")).scalar_one()
+        lists = max(10, rows // 1000 if rows <= 1_000_000 else int(rows ** 0.5))
+        conn.execute(text(vector_index_ddl(kind, lists)))
+    return name
+
+
+def drop_vector_index(kind: str) -> str:
+    name = VECTOR_INDEX_NAMES[kind]
+    with get_engine().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    return name
+
+
+def vector_index_status() -> List[dict]:
+    with get_engine().connect() as conn:
+        rows = conn.execute(text("""
+            SELECT c.relname, am.amname, i.indisvalid, pg_relation_size(c.oid)
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_am am ON am.oid = c.relam
+            WHERE i.indrelid = 'document_chunks'::regclass AND am.amname IN ('hnsw', 'ivfflat')
+        """)).all()
+    return [{"name": name, "type": kind, "valid": valid, "size_bytes": size} for name, kind, valid, size in rows]
+
+
+def find_document_chunks(file_hash: str, model_name: str) -> Optional[List[Tuple[str, List[float], dict]]]:
+    """
+    Returns (text, vector, metadata) for every chunk of a file already ingested
+    into a completed document with the same model, or None. Only one source
+    document is used so chunks are never duplicated.
+    """
+    query = text("""
+        WITH source AS (
+            SELECT d.id
+            FROM pathway_document d
+            WHERE d.file_hash = :file_hash
+              AND d.embedding_status = 'COMPLETED'
+              AND EXISTS (
+                  SELECT 1 FROM document_chunks c
+                  WHERE c.document_id = d.id AND c.embedding_model = :model
+              )
+            LIMIT 1
+        )
+        SELECT c.content, c.embedding::text, c.cmetadata
+        FROM document_chunks c
+        WHERE c.document_id = (SELECT id FROM source)
+        ORDER BY c.page, c.chunk_index
+    """)
+    with get_engine().connect() as conn:
+        rows = conn.execute(query, {"file_hash": file_hash, "model": model_name}).all()
+
+    if not rows:
+        return None
+    return [(content, _parse_vector(vector), dict(metadata or {})) for content, vector, metadata in rows]
+
+
+def _parse_vector(vector) -> List[float]:
+    if isinstance(vector, str):
+        return [float(v) for v in vector.strip("[]").split(",")]
+    return [float(v) for v in vector]
@@ -0,0 +1,52 @@
+import random
+import string
+
+from services.dedup_service import MinHashDeduplicator, _lsh_shape, jaccard, shingle_set
+
+
+def _words(rng: random.Random, n: int) -> list:
+    return ["".join(rng.choice(string.ascii_lowercase) for _ in range(7)) for _ in range(n)]
+
+
+def _pair(seed: int, replaced: int, n: int = 120):
+    """Two texts of distinct words differing only in their last `replaced` words."""
+    rng = random.Random(seed)
+    original = _words(rng, n)
+    edited = original[:n - replaced] + _words(rng, replaced)
+    return " ".join(original), " ".join(edited)
+
+
+def test_lsh_midpoint_is_at_or_below_threshold():
+    for threshold in (0.5, 0.7, 0.85, 0.9, 0.95):
+        bands, rows = _lsh_shape(threshold)
+        assert (1 / bands) ** (1 / rows) <= threshold
+    assert _lsh_shape(0.85) == (8, 8)
+
+
+def test_pair_at_threshold_is_dropped():
+    # 9 of 120 words replaced: shingle Jaccard 109/127 ~ 0.858
+    original, edited = _pair(0, replaced=9)
+    assert 0.85 <= jaccard(shingle_set(original), shingle_set(edited)) < 0.86
+
+    deduplicator = MinHashDeduplicator(0.85)
+    assert not deduplicator.is_duplicate(original)
+    assert deduplicator.is_duplicate(edited)
+
+
+def test_most_pairs_at_threshold_are_dropped():
+    dropped = 0
+    for seed in range(200):
+        original, edited = _pair(seed, replaced=9)
+        deduplicator = MinHashDeduplicator(0.85)
+        deduplicator.is_duplicate(original)
+        dropped += deduplicator.is_duplicate(edited)
+    # An 8 x 8 layout makes a pair at 0.858 a candidate ~93% of the time
+    assert dropped / 200 >= 0.85
+
+
+def test_pair_below_threshold_is_kept():
+    # 20 of 120 words replaced: shingle Jaccard 98/138 ~ 0.71
+    original, edited = _pair(1, replaced=20)
+    deduplicator = MinHashDeduplicator(0.85)
+    assert not deduplicator.is_duplicate(original)
+    assert not deduplicator.is_duplicate(edited)
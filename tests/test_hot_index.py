@@ -0,0 +1,31 @@
+import os
+import uuid
+
+import numpy as np
+
+from services import hot_index
+from services.hot_index import PathwayIndex
+
+
+def _index() -> PathwayIndex:
+    return PathwayIndex(np.eye(3, dtype=np.float32), ["a", "b", "c"], [{}, {}, {}], [10, 11, 12])
+
+
+def test_nearest_rows_and_distances():
+    index = _index()
+    assert [row for row, _ in index.nearest_rows([1.0, 0.1, 0.0], 2)] == [0, 1]
+    assert index.distances([1.0, 0.0, 0.0], [index.row_of_id[12], index.row_of_id[10]]) == [1.0, 0.0]
+
+
+def test_snapshot_keeps_newer_versions(tmp_path, monkeypatch):
+    monkeypatch.setattr(hot_index, "HOT_INDEX_DIR", str(tmp_path))
+    pathway_id = uuid.uuid4()
+
+    hot_index._save_snapshot(pathway_id, 5, _index())
+    # A slower worker still on an older version must not delete the newer snapshot
+    hot_index._save_snapshot(pathway_id, 3, _index())
+    assert hot_index._load_snapshot(pathway_id, 5) is not None
+
+    hot_index._save_snapshot(pathway_id, 7, _index())
+    assert sorted(os.listdir(tmp_path)) == [f"{pathway_id}_v7.json", f"{pathway_id}_v7.npy"]
+    assert hot_index._load_snapshot(pathway_id, 7).ids == [10, 11, 12]
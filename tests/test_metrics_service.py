@@ -0,0 +1,36 @@
+from langchain_core.documents import Document
+
+from services.dedup_service import drop_near_duplicates
+from services.metrics_service import collect_metrics
+
+
+def _fine():
+    return {"hits": 1}
+
+
+def _broken():
+    raise RuntimeError("pool closed")
+
+
+def test_failing_sources_are_reported_not_raised():
+    metrics = collect_metrics({
+        "fine": f"{__name__}:_fine",
+        "broken": f"{__name__}:_broken",
+        "missing": "services.no_such_module:stats",
+    })
+    assert metrics["fine"] == {"hits": 1}
+    assert metrics["broken"] == {"error": "RuntimeError: pool closed"}
+    assert metrics["missing"]["error"].startswith("ModuleNotFoundError")
+
+
+def test_default_sources_expose_process_counters():
+    before = collect_metrics()["dedup"]
+    chunks = [Document(page_content="Lecture 4 slides, page 1 of 30")] * 3
+    list(drop_near_duplicates(chunks, {}))
+
+    metrics = collect_metrics()
+    assert metrics["dedup"]["chunks_checked"] == before["chunks_checked"] + 3
+    assert metrics["dedup"]["chunks_dropped"] == before["chunks_dropped"] + 2
+    assert metrics["hot_index"]["budget_bytes"] > 0
+    assert {"hits", "misses", "hit_rate"} <= set(metrics["answer_cache"])
+    assert {"hits", "misses", "size"} <= set(metrics["retrieval_cache"])
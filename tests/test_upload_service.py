@@ -0,0 +1,44 @@
+import io
+
+import pytest
+from pypdf import PdfWriter
+
+from services.upload_service import SpooledUpload, UploadRejected, validate_pdf
+
+
+def _pdf(user_password: str = None, owner_password: str = None, pages: int = 2) -> bytes:
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=200, height=200)
+    if owner_password is not None:
+        writer.encrypt(user_password=user_password or "", owner_password=owner_password, algorithm="RC4-128")
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def _upload(content: bytes) -> SpooledUpload:
+    return SpooledUpload("notes.pdf", io.BytesIO(content), len(content), "hash")
+
+
+def test_plain_pdf_is_accepted():
+    upload = _upload(_pdf())
+    validate_pdf(upload)
+    assert upload.page_count == 2
+
+
+def test_owner_password_only_pdf_is_accepted():
+    upload = _upload(_pdf(owner_password="publisher"))
+    validate_pdf(upload)
+    assert upload.page_count == 2
+
+
+def test_user_password_pdf_is_rejected():
+    with pytest.raises(UploadRejected, match="password protected"):
+        validate_pdf(_upload(_pdf(user_password="secret", owner_password="publisher")))
+
+
+def test_malformed_pdf_is_rejected():
+    content = _pdf()
+    with pytest.raises(UploadRejected, match="not a readable PDF"):
+        validate_pdf(_upload(content[:40] + b"garbage" + content[-200:]))
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+Standalone ingestion worker: claims queued PDF ingestion jobs from Postgres
+and embeds them. Run one or more of these on dedicated nodes:
+
+    python worker.py
+"""
+import asyncio
+import signal
+
+from services.ingestion_worker import run_worker_loop
+
+
+async def main():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await run_worker_loop(stop)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())